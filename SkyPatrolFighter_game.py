@@ -1,8 +1,49 @@
-import os, sys, math, random, pygame
+import os, io, sys, math, mmap, time, heapq, random, struct, zlib, threading, pygame
+from collections import OrderedDict, deque
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele o jogo usa só sprites
+    np = None
 
 # ---------------- Config ----------------
 BASE_W, BASE_H = 540, 900   # retrato
-FPS = 60
+FPS = 60                    # menus e telas estáticas
+TICK_RATE = 60              # ticks de lógica por segundo (todos os timers contam ticks)
+RENDER_FPS = FPS            # limite de FPS do desenho na partida; 0 = sem limite
+VSYNC = False               # pede vsync ao SDL (precisa de janela SCALED)
+MAX_CATCHUP_STEPS = 5       # máximo de ticks por frame; acima disso o atraso é descartado
+RENDER_BACKEND = "flip"     # "flip" redesenha a tela toda; "dirty" só envia os retângulos alterados
+DIRTY_THRESHOLD = 0.5       # fração da tela acima da qual o modo "dirty" volta para flip()
+DIRTY_SCROLL_EVERY = 0      # modo "dirty": rola o fundo em passos a cada N ticks (0 = fundo parado);
+                            # cada passo repinta a tela toda, só os ticks entre passos ganham
+ENTITY_STORE = False        # tiros inimigos e mísseis em arrays NumPy (bullet hell); ignorado sem NumPy
+PROFILE_PATH = None         # grava amostras por frame e exporta (.csv ou .json) ao sair
+REPLAY_DIR = None           # pasta onde cada partida vira um replay .spfr
+STARTUP_REPORT = False      # imprime tempo até o primeiro frame e até o jogo ficar jogável
+LATE_DECODE_RAISE = False   # debug: asset decodificado durante a partida vira RuntimeError em vez de aviso
+ASSET_PACK = "auto"         # "auto" (só no EXE), "on" ou "off": ler assets.pak em vez dos arquivos soltos
+SPRITE_ATLAS = True         # junta as imagens dos sprites em atlas e desenha cada camada com um blits()
+ATLAS_MAX_SIZE = 2048       # lado máximo de uma página do atlas
+VIEW_MODE = "window"        # "window" escala cada asset para a janela; "canvas" desenha em BASE numa Surface e escala uma vez
+CANVAS_SCALE = 1.0          # resolução interna do canvas (0.5 = metade, para máquina fraca)
+CANVAS_FILTER = "smooth"    # escala final: "smooth", "fast" (vizinho mais próximo) ou "integer" (pixel perfeito)
+
+_T_START = time.perf_counter()
+# tamanho das listas livres dos pools (pré-alocadas no início)
+POOL_SIZES = {"bullet": 64, "enemy_bullet": 256, "missile": 24, "explosion": 48}
+COLLISION_CELL = 64         # lado da célula do hash espacial (px na escala base)
+COLLISION_MASKS = False     # narrow-phase por máscara de pixels depois do teste de retângulo
+PARTICLES = True            # explosões/chamas/destroços/faíscas no sistema de partículas (precisa de NumPy)
+PARTICLE_BUDGET = 1024      # máximo de partículas vivas ao mesmo tempo
+QUALITY_LEVEL = None        # None = governador automático; 0..4 fixa o nível (0 = tudo ligado)
+WAVES = "classic"           # roteiro de ondas/padrões de tiro (nome embutido ou arquivo .json)
+AUTOSAVE_PATH = None        # grava um snapshot da partida a cada AUTOSAVE_EVERY ticks (numa thread); --resume retoma
+AUTOSAVE_EVERY = 600        # 10 s de jogo
+REWIND_EVERY = 30           # ticks entre os snapshots do rebobinar (Backspace)
+REWIND_DEPTH = 20           # snapshots guardados para rebobinar (20 x 30 ticks = 10 s)
+SFX_CHANNELS = 8            # canais do mixer para efeitos sonoros (pool de vozes)
+SFX_STARTS_PER_TICK = 3     # máximo de vozes novas por tick (o resto do tick é descartado)
+SFX_VOLUME = 0.8
 
 # ---------------- Assets resolver (robusto para EXE + assets ao lado OU --add-data) ----------------
 def _resolve_assets():
@@ -25,14 +66,190 @@ ASSETS_DIR = _resolve_assets()
 IMG_DIR = os.path.join(ASSETS_DIR, "images")
 SND_DIR = os.path.join(ASSETS_DIR, "sounds")
 
+# ---------------- Arquivo de assets empacotado ----------------
+# tools/pack_assets.py junta assets/images e assets/sounds num único assets.pak:
+# imagens já em pixels RGBA e sons em PCM no formato do mixer, com índice no fim.
+# O jogo mapeia o arquivo em memória (mmap) e cria Surfaces/Sounds direto dos buffers.
+PACK_MAGIC = b"SPFA"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<4sHIQ")     # magic, versão, nº de entradas, offset do índice
+PACK_ENTRY = struct.Struct("<HBiiiQQ")    # len(nome), tipo, a, b, c, offset, tamanho
+PACK_FILE, PACK_RGBA, PACK_PCM = 0, 1, 2  # a,b,c: RGBA = (w, h, 0); PCM = (freq, size, canais)
+
+class AssetPack:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+        magic, version, count, index_at = PACK_HEADER.unpack_from(self._mm, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"{path}: assets.pak inválido ou de outra versão")
+        self.entries = {}       # "images/player.png" -> [(tipo, a, b, c, offset, tamanho), ...]
+        pos = index_at
+        for _ in range(count):
+            nlen, kind, a, b, c, off, size = PACK_ENTRY.unpack_from(self._mm, pos)
+            pos += PACK_ENTRY.size
+            name = bytes(self._mm[pos:pos + nlen]).decode("utf-8")
+            pos += nlen
+            self.entries.setdefault(name, []).append((kind, a, b, c, off, size))
+
+    def names(self, folder):
+        prefix = folder + "/"
+        return sorted(n[len(prefix):] for n in self.entries if n.startswith(prefix))
+
+    def _find(self, name, kind):
+        for e in self.entries.get(name, ()):
+            if e[0] == kind:
+                return e
+        return None
+
+    def image(self, name):
+        e = self._find("images/" + name, PACK_RGBA)
+        if e is None:
+            return None
+        _, w, h, _, off, size = e
+        # frombuffer não copia: a Surface aponta para o mmap
+        return pygame.image.frombuffer(self._view[off:off + size], (w, h), "RGBA")
+
+    def sound(self, name):
+        if not pygame.mixer.get_init():
+            return None
+        e = self._find("sounds/" + name, PACK_PCM)
+        if e is not None and (e[1], e[2], e[3]) == pygame.mixer.get_init():
+            off, size = e[4], e[5]
+            return pygame.mixer.Sound(buffer=self._view[off:off + size])
+        # mixer aberto em outro formato: decodifica o arquivo original guardado no pack
+        e = self._find("sounds/" + name, PACK_FILE)
+        if e is None:
+            return None
+        off, size = e[4], e[5]
+        return pygame.mixer.Sound(file=io.BytesIO(self._view[off:off + size]))
+
+def _resolve_pack():
+    # mesmos lugares e mesma ordem do _resolve_assets, procurando assets.pak
+    cands = []
+    if getattr(sys, "frozen", False):
+        mp = getattr(sys, "_MEIPASS", None)
+        exe_dir = os.path.dirname(sys.executable)
+        if mp:
+            cands.append(mp)                             # 1) embutido
+        cands.append(exe_dir)                            # 2) do lado do .exe
+        cands.append(os.path.dirname(exe_dir))           # 3) dist\ (fallback)
+    else:
+        cands.append(os.path.dirname(os.path.abspath(__file__)))
+    for d in cands:
+        p = os.path.join(d, "assets.pak")
+        if os.path.isfile(p):
+            return p
+    return None
+
+_PACK = None
+
+def asset_pack():
+    # "auto": EXE usa o pack se existir; rodando via python ficam os arquivos soltos
+    global _PACK
+    if _PACK is None:
+        _PACK = False
+        use = ASSET_PACK == "on" or (ASSET_PACK == "auto" and getattr(sys, "frozen", False))
+        path = _resolve_pack() if use else None
+        if path:
+            try:
+                _PACK = AssetPack(path)
+            except (OSError, ValueError, struct.error):
+                _PACK = False
+    return _PACK or None
+
+# ---------------- Cache de assets ----------------
+# LRU limitado: cada imagem é decodificada/convertida/escalada UMA vez;
+# spawnar um sprite custa só um lookup no dict.
+class AssetCache:
+    def __init__(self, max_items=512):
+        self.max_items = max_items
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.strict = False         # ligado na partida: todo miss ali é um decode fora de hora
+        self.late = []              # as primeiras late_max chaves decodificadas fora de hora
+        self.late_max = 32
+        self.late_count = 0
+
+    def _late(self, key):
+        self.late_count += 1
+        if len(self.late) < self.late_max:
+            self.late.append(key)
+        if LATE_DECODE_RAISE:
+            raise RuntimeError(f"asset decodificado durante a partida: {key!r}")
+        if self.late_count == 1:
+            print(f"aviso: asset decodificado durante a partida: {key!r} "
+                  f"(falta pré-carregar em warm_sprite_cache?)", file=sys.stderr)
+
+    def get(self, key, build):
+        try:
+            val = self._data[key]
+        except KeyError:
+            self.misses += 1
+            if self.strict:
+                self._late(key)
+            val = build()
+            self.put(key, val)
+            return val
+        self._data.move_to_end(key)
+        self.hits += 1
+        return val
+
+    def put(self, key, val):
+        self._data[key] = val
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        return {"items": len(self._data), "max_items": self.max_items,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "late": self.late_count}
+
+ASSET_CACHE = AssetCache(max_items=512)
+
 # ---------------- Util ----------------
-def load_image(name):
+def _load_image_file(name):
+    pack = asset_pack()
+    if pack is not None:
+        img = pack.image(name)
+        if img is None:
+            return None
+        return img.convert_alpha() if pygame.display.get_surface() else img
     p = os.path.join(IMG_DIR, name)
     if os.path.exists(p):
-        return pygame.image.load(p).convert_alpha()
+        img = pygame.image.load(p)
+        # sem janela (runner headless) não há formato de tela para converter
+        return img.convert_alpha() if pygame.display.get_surface() else img
     return None
 
+def load_image(name):
+    # None (arquivo ausente) também fica em cache: nada de os.path.exists por frame
+    return ASSET_CACHE.get((name, 1.0, "raw"), lambda: _load_image_file(name))
+
 def load_sound(name):
+    if name in SOUND_CACHE:
+        return SOUND_CACHE[name]
+    pack = asset_pack()
+    if pack is not None:
+        try:
+            return pack.sound(name)
+        except pygame.error:
+            return None
     p = os.path.join(SND_DIR, name)
     if os.path.exists(p):
         try:
@@ -41,20 +258,102 @@ def load_sound(name):
             return None
     return None
 
+def _smoothscale(img, factor):
+    w, h = img.get_width(), img.get_height()
+    return pygame.transform.smoothscale(img, (max(1, int(w*factor)), max(1, int(h*factor))))
+
 def scale_surface(img, factor):
     if not img:
         return None
-    w, h = img.get_width(), img.get_height()
-    return pygame.transform.smoothscale(img, (max(1, int(w*factor)), max(1, int(h*factor))))
+    # a entrada guarda a surface original, então o id() não é reaproveitado enquanto ela existir
+    entry = ASSET_CACHE.get((id(img), factor, "scaled"), lambda: (img, _smoothscale(img, factor)))
+    return entry[1]
 
 def slice_sheet(img, rows, cols):
-    w = img.get_width() // cols
-    h = img.get_height() // rows
-    frames = []
-    for r in range(rows):
-        for c in range(cols):
-            frames.append(img.subsurface((c*w, r*h, w, h)).copy())
-    return frames
+    def build():
+        w = img.get_width() // cols
+        h = img.get_height() // rows
+        frames = []
+        for r in range(rows):
+            for c in range(cols):
+                frames.append(img.subsurface((c*w, r*h, w, h)).copy())
+        return img, frames
+    return ASSET_CACHE.get((id(img), (rows, cols), "sheet"), build)[1]
+
+def sprite_image(name, scale, fallback=None, variant="sprite"):
+    # imagem já escalada para o sprite; `fallback` desenha a forma procedural se o PNG não existir
+    def build():
+        base = load_image(name)
+        if base is None:
+            if fallback is None:
+                return None
+            base = fallback()
+        return _smoothscale(base, scale)
+    return ASSET_CACHE.get((name, scale, variant), build)
+
+def sprite_frames(name, rows, cols, scale, fallback=None):
+    # frames de um atlas (ex.: explosão), fatiados e escalados uma vez só
+    def build():
+        sheet = load_image(name)
+        if sheet is None:
+            return [fallback()] if fallback else []
+        return [_smoothscale(f, scale) for f in slice_sheet(sheet, rows, cols)]
+    return ASSET_CACHE.get((name, scale, f"frames{rows}x{cols}"), build)
+
+# ---------------- Formas procedurais (quando falta o PNG) ----------------
+def _player_fallback():
+    base = pygame.Surface((84, 84), pygame.SRCALPHA)
+    pygame.draw.polygon(base, (200, 200, 210), [(42, 6), (8, 78), (76, 78)])
+    pygame.draw.line(base, (255, 255, 255), (42, 6), (42, 60), 2)
+    return base
+
+def _bullet_fallback():
+    img = pygame.Surface((6, 18), pygame.SRCALPHA)
+    pygame.draw.rect(img, (255, 255, 0), (2, 0, 2, 18))
+    return img
+
+def _missile_fallback():
+    img = pygame.Surface((8, 24), pygame.SRCALPHA)
+    pygame.draw.rect(img, (220, 220, 220), (2, 0, 4, 24), border_radius=2)
+    pygame.draw.polygon(img, (200, 0, 0), [(2, 20), (6, 20), (4, 24)])
+    return img
+
+def _enemy_fallback(scale):
+    size = (int(44*scale), int(44*scale))
+    base = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.circle(base, (200, 100, 100), (size[0]//2, size[1]//2), min(size)//2-3)
+    return base
+
+def _enemy_bullet_fallback():
+    img = pygame.Surface((5, 14), pygame.SRCALPHA)
+    pygame.draw.rect(img, (255, 80, 120), (2, 0, 2, 14))
+    return img
+
+def _boss_fallback():
+    base = pygame.Surface((200, 150), pygame.SRCALPHA)
+    pygame.draw.rect(base, (90, 110, 80), (0, 0, 200, 150), border_radius=12)
+    return base
+
+def _afterburner_flame():
+    # chama da turbina pré-desenhada (antes eram dois draw.polygon por frame)
+    def build():
+        img = pygame.Surface((7, 9), pygame.SRCALPHA)
+        pygame.draw.polygon(img, (255, 180, 40), [(0, 0), (6, 0), (3, 8)])
+        return img
+    return ASSET_CACHE.get(("afterburner", 1.0, "flame"), build)
+
+def _shield_ring(radius):
+    # anel do escudo por raio (o raio só pulsa entre 7 valores): blit em vez de draw.circle
+    def build():
+        img = pygame.Surface((2*radius + 1, 2*radius + 1), pygame.SRCALPHA)
+        pygame.draw.circle(img, (120, 200, 255), (radius, radius), radius, 2)
+        return img
+    return ASSET_CACHE.get(("shield", radius, "ring"), build)
+
+def _explosion_fallback(scale):
+    surf = pygame.Surface((int(64*scale), int(64*scale)), pygame.SRCALPHA)
+    pygame.draw.circle(surf, (255, 200, 0), (surf.get_width()//2, surf.get_height()//2), surf.get_width()//2-4)
+    return surf
 
 # ---------------- Sprites ----------------
 class Player(pygame.sprite.Sprite):
@@ -62,9 +361,7 @@ class Player(pygame.sprite.Sprite):
         super().__init__()
         base = load_image("player.png")
         if base is None:
-            base = pygame.Surface((84, 84), pygame.SRCALPHA)
-            pygame.draw.polygon(base, (200, 200, 210), [(42, 6), (8, 78), (76, 78)])
-            pygame.draw.line(base, (255, 255, 255), (42, 6), (42, 60), 2)
+            base = ASSET_CACHE.get(("player.png", 1.0, "fallback"), _player_fallback)
         self.image_raw = base
         self.image = scale_surface(base, scale)
         self.rect = self.image.get_rect(midbottom=(WIDTH//2, HEIGHT-40))
@@ -75,11 +372,11 @@ class Player(pygame.sprite.Sprite):
         self.missiles = 20     # 20 mísseis guiados
         self.missile_cd = 0
 
-    def update(self, keys=None):
-        if keys is None:
-            keys = pygame.key.get_pressed()
-        vx = (keys[pygame.K_RIGHT] or keys[pygame.K_d]) - (keys[pygame.K_LEFT] or keys[pygame.K_a])
-        vy = (keys[pygame.K_DOWN] or keys[pygame.K_s]) - (keys[pygame.K_UP] or keys[pygame.K_w])
+    def update(self, inputs=None):
+        if inputs is None:
+            inputs = read_inputs()
+        vx = bool(inputs & IN_RIGHT) - bool(inputs & IN_LEFT)
+        vy = bool(inputs & IN_DOWN) - bool(inputs & IN_UP)
         self.rect.x += int(vx * self.speed)
         self.rect.y += int(vy * self.speed)
         self.rect.clamp_ip(pygame.Rect(0, 0, WIDTH, HEIGHT))
@@ -87,29 +384,106 @@ class Player(pygame.sprite.Sprite):
         if self.shield_timer > 0: self.shield_timer -= 1
         if self.missile_cd > 0: self.missile_cd -= 1
 
-    def draw_afterburner(self, surface):
+    def afterburner_blits(self, rect=None):
         # duas turbinas pequenas saindo dos motores
-        cx, by = self.rect.centerx, self.rect.bottom
+        rect = rect or self.rect
+        flame = _afterburner_flame()
         off = int(12 * GFX_SCALE)
-        for dx in (-off, off):
-            x = cx + dx
-            y = by - int(10 * GFX_SCALE)
-            flame = [(x-3, y+8), (x+3, y+8), (x, y+16)]
-            pygame.draw.polygon(surface, (255, 180, 40), flame)
+        y = rect.bottom - int(10 * GFX_SCALE) + 8
+        return [(flame, (rect.centerx - off - 3, y)), (flame, (rect.centerx + off - 3, y))]
+
+    def draw_afterburner(self, surface, rect=None, atlas=None, flames=True, view=None):
+        # flames=False: a chama vem do sistema de partículas, aqui só o escudo
+        rect = rect or self.rect
+        seq = self.afterburner_blits(rect) if flames else []
         if self.shield_timer > 0:
             t = pygame.time.get_ticks() / 120.0
-            radius = max(self.rect.width, self.rect.height)//2 + 3 + int(3*math.sin(t))
-            pygame.draw.circle(surface, (120, 200, 255), self.rect.center, radius, 2)
+            radius = max(rect.width, rect.height)//2 + 3 + int(3*math.sin(t))
+            seq.append((_shield_ring(radius), (rect.centerx - radius, rect.centery - radius)))
+        if view is not None:
+            seq = view.batch(seq)
+        surface.blits(atlas.batch(seq) if atlas else seq, doreturn=False)
+
+    def engine_points(self):
+        off = int(12 * GFX_SCALE)
+        y = self.rect.bottom - int(10 * GFX_SCALE) + 12
+        return ((self.rect.centerx - off, y), (self.rect.centerx + off, y))
+
+# ---------------- Pools de sprites ----------------
+# Tiros, mísseis e explosões são reciclados: kill() devolve o sprite para a lista livre
+# e acquire() chama reset() em vez de criar Sprite/Rect novos.
+class SpritePool:
+    def __init__(self, cls, size=0):
+        self.cls = cls
+        self.size = size          # máximo de sprites guardados na lista livre
+        self.free = []
+        self.allocated = 0        # instâncias criadas desde o início
+        self.reused = 0           # acquires atendidos pela lista livre
+        self.in_use = 0
+        self.peak = 0
+
+    def prewarm(self, *args, **kw):
+        while len(self.free) < self.size:
+            obj = self.cls(*args, **kw)
+            obj.pool = self
+            obj.pooled = True
+            self.allocated += 1
+            self.free.append(obj)
 
-class Bullet(pygame.sprite.Sprite):
+    def acquire(self, *args, **kw):
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args, **kw)
+            self.reused += 1
+        else:
+            obj = self.cls(*args, **kw)
+            obj.pool = self
+            self.allocated += 1
+        obj.pooled = False
+        self.in_use += 1
+        if self.in_use > self.peak:
+            self.peak = self.in_use
+        return obj
+
+    def release(self, obj):
+        if obj.pooled:
+            return              # kill() repetido
+        obj.pooled = True
+        self.in_use -= 1
+        if len(self.free) < self.size:
+            self.free.append(obj)
+
+    def stats(self):
+        return {"size": self.size, "free": len(self.free), "in_use": self.in_use,
+                "peak": self.peak, "allocated": self.allocated, "reused": self.reused}
+
+class PooledSprite(pygame.sprite.Sprite):
+    pool = None
+    pooled = False
+
+    def kill(self):
+        super().kill()
+        if self.pool is not None:
+            self.pool.release(self)
+
+    def _place(self, **anchor):
+        # reaproveita o Rect existente quando o sprite volta do pool
+        rect = getattr(self, "rect", None)
+        if rect is None:
+            self.rect = self.image.get_rect(**anchor)
+        else:
+            rect.size = self.image.get_size()
+            for k, v in anchor.items():
+                setattr(rect, k, v)
+
+class Bullet(PooledSprite):
     def __init__(self, x, y, speed=-14*1.0, scale=1.0):
         super().__init__()
-        img = load_image("bullet.png")
-        if img is None:
-            img = pygame.Surface((6, 18), pygame.SRCALPHA)
-            pygame.draw.rect(img, (255, 255, 0), (2, 0, 2, 18))
-        self.image = scale_surface(img, scale)
-        self.rect = self.image.get_rect(center=(x, y))
+        self.reset(x, y, speed, scale)
+
+    def reset(self, x, y, speed=-14*1.0, scale=1.0):
+        self.image = sprite_image("bullet.png", scale, _bullet_fallback)
+        self._place(center=(x, y))
         self.speed = int(speed * scale)
 
     def update(self):
@@ -117,16 +491,14 @@ class Bullet(pygame.sprite.Sprite):
         if self.rect.bottom < 0 or self.rect.top > HEIGHT:
             self.kill()
 
-class HomingMissile(pygame.sprite.Sprite):
+class HomingMissile(PooledSprite):
     def __init__(self, x, y, scale=1.0):
         super().__init__()
-        img = load_image("missile.png")
-        if img is None:
-            img = pygame.Surface((8, 24), pygame.SRCALPHA)
-            pygame.draw.rect(img, (220, 220, 220), (2, 0, 4, 24), border_radius=2)
-            pygame.draw.polygon(img, (200, 0, 0), [(2, 20), (6, 20), (4, 24)])
-        self.image = scale_surface(img, scale)
-        self.rect = self.image.get_rect(center=(x, y))
+        self.reset(x, y, scale)
+
+    def reset(self, x, y, scale=1.0):
+        self.image = sprite_image("missile.png", scale, _missile_fallback)
+        self._place(center=(x, y))
         self.vx, self.vy = 0, -8*scale
         self.turn_rate = 0.10
         self.speed = 8 * scale
@@ -148,58 +520,62 @@ class HomingMissile(pygame.sprite.Sprite):
             self.kill()
 
 class Enemy(pygame.sprite.Sprite):
-    def __init__(self, kind="drone", scale=1.0):
+    def __init__(self, kind="drone", scale=1.0, rng=random, x=None):
         super().__init__()
         name = {"drone": "enemy_drone.png", "ufo": "enemy_ufo.png", "fighter": "enemy_fighter.png"}[kind]
-        base = load_image(name)
-        if base is None:
-            size = (int(44*scale), int(44*scale))
-            base = pygame.Surface(size, pygame.SRCALPHA)
-            pygame.draw.circle(base, (200, 100, 100), (size[0]//2, size[1]//2), min(size)//2-3)
-        self.image = scale_surface(base, scale)
-        self.rect = self.image.get_rect(midtop=(random.randint(24, WIDTH-24), -40))
-        self.speedy = random.randint(2, 5)
-        self.speedx = random.choice([-2, -1, 0, 1, 2]) if kind != "drone" else 0
+        self.kind = kind
+        self.image = sprite_image(name, scale, lambda: _enemy_fallback(scale))
+        # x: fração da largura (ondas roteirizadas); sem ele, posição sorteada
+        cx = rng.randint(24, WIDTH-24) if x is None else int(x * WIDTH)
+        self.rect = self.image.get_rect(midtop=(cx, -40))
+        self.speedy = rng.randint(2, 5)
+        self.speedx = rng.choice([-2, -1, 0, 1, 2]) if kind != "drone" else 0
         self.hp = {"drone": 2, "ufo": 3, "fighter": 12}.get(kind, 2)
-        self.shoot_cd = random.randint(60, 120) if kind in ("drone", "ufo") else 9999
+        # primeiro tiro; os seguintes vêm da fila de disparos da simulação
+        self.shoot_cd = rng.randint(60, 120) if kind in ("drone", "ufo") else 9999
+        self.seq = 0            # ordem de spawn: desempate da fila de disparos
 
     def update(self):
         self.rect.y += self.speedy
         self.rect.x += self.speedx
         if self.rect.top > HEIGHT + 50 or self.rect.right < -50 or self.rect.left > WIDTH + 50:
             self.kill()
-        self.shoot_cd -= 1
 
-class EnemyBullet(pygame.sprite.Sprite):
-    def __init__(self, x, y, scale=1.0):
+class EnemyBullet(PooledSprite):
+    def __init__(self, x, y, scale=1.0, vx=0.0, vy=None):
         super().__init__()
-        img = load_image("enemy_bullet.png")
-        if img is None:
-            img = pygame.Surface((5, 14), pygame.SRCALPHA)
-            pygame.draw.rect(img, (255, 80, 120), (2, 0, 2, 14))
-        self.image = scale_surface(img, scale)
-        self.rect = self.image.get_rect(center=(x, y))
-        self.speed = int(6 * scale)
+        self.reset(x, y, scale, vx, vy)
+
+    def reset(self, x, y, scale=1.0, vx=0.0, vy=None):
+        # sem vy: o tiro clássico, reto para baixo com velocidade inteira
+        self.image = sprite_image("enemy_bullet.png", scale, _enemy_bullet_fallback)
+        self._place(center=(x, y))
+        self.vx = vx
+        self.vy = int(6 * scale) if vy is None else vy
+        self.fx, self.fy = float(self.rect.x), float(self.rect.y)
 
     def update(self):
-        self.rect.y += self.speed
-        if self.rect.top > HEIGHT:
+        if self.vx:
+            self.fx += self.vx
+            self.rect.x = int(self.fx)
+        self.fy += self.vy
+        self.rect.y = int(self.fy)
+        r = self.rect
+        if r.top > HEIGHT or r.bottom < -40 or (self.vx and (r.right < -40 or r.left > WIDTH + 40)):
             self.kill()
 
 class Boss(pygame.sprite.Sprite):
     def __init__(self, scale=1.0):
         super().__init__()
-        base = load_image("enemy_fighter.png")  # B-17 como boss
-        if base is None:
-            base = pygame.Surface((200, 150), pygame.SRCALPHA)
-            pygame.draw.rect(base, (90, 110, 80), (0, 0, 200, 150), border_radius=12)
-        self.image = scale_surface(base, 3.0*scale)  # grandão
+        # B-17 como boss, grandão
+        self.image = sprite_image("enemy_fighter.png", 3.0*scale, _boss_fallback, variant="boss")
         self.rect = self.image.get_rect(midtop=(WIDTH//2, -int(160*scale)))
         self.max_hp = 150
         self.hp = self.max_hp
         self.t = 0
         self.entered = False
         self.shoot_cd = 45
+        self.volley = 0         # quantas rajadas já deu (alterna os padrões do roteiro)
 
     def update(self):
         self.t += 1
@@ -211,20 +587,17 @@ class Boss(pygame.sprite.Sprite):
             self.rect.x = WIDTH//2 + int(140 * math.sin(self.t/60))
         self.shoot_cd -= 1
 
-class Explosion(pygame.sprite.Sprite):
+class Explosion(PooledSprite):
     def __init__(self, center, scale=1.0):
         super().__init__()
-        sheet = load_image("explosion_atlas_512x512.png")
-        if sheet:
-            frames = slice_sheet(sheet, 3, 3)
-            frames = [scale_surface(f, 0.28*scale) for f in frames]
-            self.frames = frames
-        else:
-            surf = pygame.Surface((int(64*scale), int(64*scale)), pygame.SRCALPHA)
-            pygame.draw.circle(surf, (255, 200, 0), (surf.get_width()//2, surf.get_height()//2), surf.get_width()//2-4)
-            self.frames = [surf]
+        self.reset(center, scale)
+
+    def reset(self, center, scale=1.0):
+        # sem atlas o fallback já sai no tamanho final (não passa pelo 0.28)
+        self.frames = sprite_frames("explosion_atlas_512x512.png", 3, 3, 0.28*scale,
+                                    lambda: _explosion_fallback(scale))
         self.image = self.frames[0]
-        self.rect = self.image.get_rect(center=center)
+        self._place(center=center)
         self.idx = 0
         self.timer = 0
 
@@ -236,11 +609,2328 @@ class Explosion(pygame.sprite.Sprite):
                 self.kill()
             else:
                 self.image = self.frames[self.idx]
-                self.rect = self.image.get_rect(center=self.rect.center)
+                self._place(center=self.rect.center)
+
+# ---------------- Entity store (NumPy) ----------------
+# Estrutura de arrays para projéteis em massa (modo bullet hell): posição, velocidade,
+# hp, cooldown, homing e alive em arrays; movimento, homing, culling, cooldowns e dano
+# rodam em operações vetorizadas e só viram blits na hora de desenhar. Alvos de homing
+# são sprites: ficam numa coluna de objetos que acompanha os slots.
+class EntityStore:
+    FIELDS = {"x": np.float32, "y": np.float32, "px": np.float32, "py": np.float32,
+              "vx": np.float32, "vy": np.float32, "hp": np.int16, "cd": np.int32,
+              "homing": np.bool_, "alive": np.bool_} if np is not None else {}
+
+    def __init__(self, capacity, image, turn_rate=0.10, speed=8.0):
+        if np is None:
+            raise RuntimeError("EntityStore precisa do NumPy (pip install numpy)")
+        self.image = image
+        self.w, self.h = image.get_size()
+        self.turn_rate = turn_rate  # homing, igual ao HomingMissile
+        self.speed = speed
+        self.n = 0                  # marca d'água: slots [0, n) já usados
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        old = getattr(self, "x", None)
+        for name, dtype in self.FIELDS.items():
+            arr = np.zeros(capacity, dtype)
+            if old is not None:
+                arr[:self.n] = getattr(self, name)[:self.n]
+            setattr(self, name, arr)
+        target = np.full(capacity, None, object)    # sprite alvo do homing (ou None)
+        if old is not None:
+            target[:self.n] = self.target[:self.n]
+        self.target = target
+        self.capacity = capacity
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive[:self.n]))
+
+    def clear(self):
+        self.alive[:self.n] = False
+        self.target[:self.n] = None     # não segura inimigos mortos
+        self.n = 0
+
+    def compact(self):
+        # empurra os vivos para o começo, mantendo a ordem de spawn
+        n = self.n
+        keep = np.flatnonzero(self.alive[:n])
+        k = len(keep)
+        for name in ("x", "y", "px", "py", "vx", "vy", "hp", "cd", "homing", "target"):
+            arr = getattr(self, name)
+            arr[:k] = arr[keep]
+        self.target[k:n] = None
+        self.alive[:k] = True
+        self.alive[k:n] = False
+        self.n = k
+
+    def _reserve(self, count):
+        if self.n + count > self.capacity:
+            self.compact()
+            if self.n + count > self.capacity:
+                self._alloc(max(self.capacity * 2, self.n + count))
+        start = self.n
+        self.n += count
+        return slice(start, self.n)
+
+    def spawn(self, x, y, vx=0.0, vy=0.0, hp=1, cd=0, homing=False, target=None):
+        i = self._reserve(1).start
+        self.x[i] = self.px[i] = x
+        self.y[i] = self.py[i] = y
+        self.vx[i], self.vy[i] = vx, vy
+        self.hp[i], self.cd[i] = hp, cd
+        self.homing[i] = homing
+        self.target[i] = target
+        self.alive[i] = True
+        return i
+
+    def spawn_many(self, xs, ys, vxs=0.0, vys=0.0, hp=1, cd=0, homing=False):
+        xs = np.asarray(xs, np.float32)
+        sl = self._reserve(len(xs))
+        self.x[sl] = self.px[sl] = xs
+        self.y[sl] = self.py[sl] = ys
+        self.vx[sl], self.vy[sl] = vxs, vys
+        self.hp[sl], self.cd[sl] = hp, cd
+        self.homing[sl] = homing
+        self.target[sl] = None
+        self.alive[sl] = True
+        return sl
+
+    def target_points(self):
+        # centro de cada alvo vivo por slot (NaN = sem alvo ou alvo morto)
+        n = self.n
+        tx = np.full(n, np.nan, np.float32)
+        ty = np.full(n, np.nan, np.float32)
+        for i in np.flatnonzero(self.homing[:n] & self.alive[:n]).tolist():
+            t = self.target[i]
+            if t is not None and t.alive():
+                tx[i], ty[i] = t.rect.center
+            else:
+                self.target[i] = None
+        return tx, ty
+
+    def steer(self, tx, ty):
+        # tx/ty por entidade ou um ponto só (NaN = sem alvo): mesma curva do HomingMissile;
+        # quem ainda tem cooldown (cd > 0) segue reto, o homing arma quando zera
+        n = self.n
+        homing = self.homing[:n] & self.alive[:n] & (self.cd[:n] <= 0)
+        if not homing.any():
+            return
+        x, y, vx, vy = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n]
+        tx = np.broadcast_to(np.asarray(tx, np.float32), (n,))
+        ty = np.broadcast_to(np.asarray(ty, np.float32), (n,))
+        has = homing & ~np.isnan(tx)
+        dx, dy = tx - x, ty - y
+        dist = np.hypot(dx, dy) + 1e-5
+        tr, sp = self.turn_rate, self.speed
+        vx[has] = (1 - tr) * vx[has] + tr * (dx[has] / dist[has]) * sp
+        vy[has] = (1 - tr) * vy[has] + tr * (dy[has] / dist[has]) * sp
+        vy[homing & ~has] = -sp
+
+    def update(self, width, height, margin=0, targets=None):
+        # targets: (tx, ty) para o homing; None = alvos da coluna target
+        n = self.n
+        if n == 0:
+            return
+        x, y = self.x[:n], self.y[:n]
+        alive = self.alive[:n]
+        self.px[:n] = x
+        self.py[:n] = y
+        if self.homing[:n].any():
+            self.steer(*(targets if targets is not None else self.target_points()))
+        x += self.vx[:n]
+        y += self.vy[:n]
+        hw, hh = self.w / 2, self.h / 2
+        out = (x + hw < -margin) | (x - hw > width + margin) | (y + hh < -margin) | (y - hh > height + margin)
+        alive &= ~out
+        np.subtract(self.cd[:n], 1, out=self.cd[:n], where=alive & (self.cd[:n] > 0))
+        live = np.count_nonzero(alive)
+        if live == 0:
+            self.target[:n] = None
+            self.n = 0
+        elif live < n // 2:
+            self.compact()
+
+    def collide_rect(self, rect, damage=0):
+        # AABB vetorizado contra um Rect; devolve os índices atingidos. damage tira hp
+        # de quem bateu e mata quem chega a 0 (tiro comum: hp 1, morre no impacto)
+        n = self.n
+        if n == 0:
+            return ()
+        cx, cy = rect.centerx, rect.centery
+        hit = (self.alive[:n] & (np.abs(self.x[:n] - cx) * 2 < self.w + rect.w)
+               & (np.abs(self.y[:n] - cy) * 2 < self.h + rect.h))
+        idx = np.flatnonzero(hit)
+        if damage and len(idx):
+            self.hp[idx] -= damage
+            dead = idx[self.hp[idx] <= 0]
+            self.alive[dead] = False
+            self.target[dead] = None
+        return idx
+
+    def draw(self, surface, alpha=1.0, atlas=None, view=None):
+        n = self.n
+        if n == 0:
+            return []
+        idx = np.flatnonzero(self.alive[:n])
+        x, y = self.x[idx], self.y[idx]
+        if alpha < 1.0:
+            x = self.px[idx] + (x - self.px[idx]) * alpha
+            y = self.py[idx] + (y - self.py[idx]) * alpha
+        img, w, h = self.image, self.w, self.h
+        if view is not None:
+            img = view.image(img)
+            x, y = x * view.k, y * view.k
+            w, h = img.get_size()
+        xs = (x - w / 2).astype(np.int32).tolist()
+        ys = (y - h / 2).astype(np.int32).tolist()
+        reg = atlas.regions.get(id(img)) if atlas else None
+        if reg is not None:
+            page, area = reg
+            return surface.blits([(page, p, area) for p in zip(xs, ys)])
+        return surface.blits([(img, p) for p in zip(xs, ys)])
+
+# ---------------- Partículas ----------------
+# Efeitos visuais (explosão, chama da turbina, destroços, faíscas de impacto) num
+# pool de tamanho fixo em arrays NumPy: um update vetorizado por tick e um único
+# blits por frame. Não usam o RNG da simulação, então replays não mudam.
+# Emissor: count, life (ticks), speed (min, max), angle/spread (graus, 90 = para baixo),
+# gravity, drag, priority (0 = cortado primeiro quando o orçamento aperta).
+PARTICLE_EMITTERS = {
+    "explosion": dict(count=1, life=27, speed=(0, 0), angle=0, spread=0, gravity=0.0, drag=1.0, priority=1),
+    "flame":     dict(count=1, life=4, speed=(1.5, 2.5), angle=90, spread=8, gravity=0.0, drag=0.9, priority=1),
+    "debris":    dict(count=8, life=32, speed=(1.5, 5.0), angle=0, spread=360, gravity=0.12, drag=0.97, priority=0),
+    "spark":     dict(count=4, life=8, speed=(3.0, 7.0), angle=90, spread=120, gravity=0.0, drag=0.85, priority=0),
+}
+PARTICLE_SOFT_LOAD = 0.5    # acima desta ocupação os emissores de prioridade 0 emitem cada vez menos
+
+def _dot_frames(size, colors):
+    # quadradinhos que esfriam/somem ao longo da vida
+    frames = []
+    for color in colors:
+        img = pygame.Surface((size, size), pygame.SRCALPHA)
+        img.fill(color)
+        frames.append(img)
+    return frames
+
+def particle_frames(name, scale):
+    # flipbook de cada emissor (já na escala do jogo)
+    def build():
+        if name == "explosion":
+            return sprite_frames("explosion_atlas_512x512.png", 3, 3, 0.28*scale,
+                                 lambda: _explosion_fallback(scale))
+        if name == "flame":
+            flame = _afterburner_flame()
+            return [flame, _smoothscale(flame, 0.75), _smoothscale(flame, 0.5)]
+        if name == "debris":
+            return _dot_frames(max(2, int(3*scale)), [(255, 190, 80, 255), (220, 120, 40, 230),
+                                                      (140, 110, 100, 180), (90, 90, 90, 110)])
+        return _dot_frames(max(1, int(2*scale)), [(255, 255, 220, 255), (255, 230, 120, 220), (255, 160, 60, 140)])
+    return ASSET_CACHE.get((name, scale, "particles"), build)
+
+class ParticleSystem:
+    # arrays por partícula (o que um snapshot precisa para reconstruir as vivas)
+    STATE = {"x": np.float32, "y": np.float32, "px": np.float32, "py": np.float32, "vx": np.float32,
+             "vy": np.float32, "age": np.int32, "life": np.int32, "kind": np.int32} if np is not None else {}
+
+    def __init__(self, capacity, scale=1.0, seed=0):
+        if np is None:
+            raise RuntimeError("ParticleSystem precisa do NumPy (pip install numpy)")
+        self.capacity = capacity
+        self.budget = capacity      # pode baixar em tempo de execução (governador de qualidade)
+        self.scale = scale
+        self.names = list(PARTICLE_EMITTERS)
+        self.defs = [PARTICLE_EMITTERS[n] for n in self.names]
+        # tabela plana de frames: emissor k usa frames[base[k] : base[k] + nframes[k]]
+        self.frames, base, nframes = [], [], []
+        for name in self.names:
+            fr = particle_frames(name, scale)
+            base.append(len(self.frames)); nframes.append(len(fr))
+            self.frames.extend(fr)
+        self.base = np.array(base, np.int32)
+        self.nframes = np.array(nframes, np.int32)
+        self.gravity = np.array([d["gravity"] * scale for d in self.defs], np.float32)
+        self.drag = np.array([d["drag"] for d in self.defs], np.float32)
+        self.priority = np.array([d["priority"] for d in self.defs], np.int32)
+        self.angle = np.array([d["angle"] for d in self.defs], np.float32)
+        self.spread = np.array([d["spread"] for d in self.defs], np.float32)
+        self.speed_min = np.array([d["speed"][0] for d in self.defs], np.float32)
+        self.speed_span = np.array([d["speed"][1] - d["speed"][0] for d in self.defs], np.float32)
+        self.life_tab = np.array([d["life"] for d in self.defs], np.float32)
+        # flipbooks (prioridade > 0) têm vida exata; destroços/faíscas variam ±30%
+        self.life_jitter = np.array([0.0 if d["priority"] else 0.6 for d in self.defs], np.float32)
+        self._index = {n: k for k, n in enumerate(self.names)}
+        self.half_w = np.array([f.get_width() / 2 for f in self.frames], np.float32)
+        self.half_h = np.array([f.get_height() / 2 for f in self.frames], np.float32)
+        self._sources = None
+        self._sources_atlas = None
+        self.x = np.zeros(capacity, np.float32)
+        self.y = np.zeros(capacity, np.float32)
+        self.px = np.zeros(capacity, np.float32)
+        self.py = np.zeros(capacity, np.float32)
+        self.vx = np.zeros(capacity, np.float32)
+        self.vy = np.zeros(capacity, np.float32)
+        self.age = np.zeros(capacity, np.int32)
+        self.life = np.ones(capacity, np.int32)
+        self.kind = np.zeros(capacity, np.int32)
+        self.alive = np.zeros(capacity, bool)
+        self.live = 0
+        self.emitted = 0
+        self.dropped = 0
+        self.reset(seed)
+
+    def __len__(self):
+        return self.live
+
+    def reset(self, seed=0):
+        self.alive[:] = False
+        self.live = 0
+        self._pending = []
+        self._pending_n = 0
+        self.rng = np.random.default_rng(seed)
+
+    def set_budget(self, budget):
+        self.budget = max(0, min(self.capacity, int(budget)))
+
+    def emit(self, name, x, y, count=None):
+        # só enfileira: o nascimento de tudo que foi emitido no tick sai vetorizado no update()
+        k = self._index[name]
+        d = self.defs[k]
+        count = d["count"] if count is None else count
+        budget = self.budget
+        if d["priority"] == 0 and budget:
+            load = (self.live + self._pending_n) / budget
+            if load > PARTICLE_SOFT_LOAD:
+                keep = max(0.0, (1.0 - load) / (1.0 - PARTICLE_SOFT_LOAD))
+                self.dropped += count - int(count * keep)
+                count = int(count * keep)
+        if count > 0:
+            self._pending.append((k, x, y, count))
+            self._pending_n += count
+        return count
+
+    def _spawn(self):
+        pending, self._pending, self._pending_n = self._pending, [], 0
+        ks, xs, ys, counts = zip(*pending)
+        kind = np.repeat(np.array(ks, np.int32), counts)
+        x = np.repeat(np.array(xs, np.float32), counts)
+        y = np.repeat(np.array(ys, np.float32), counts)
+        budget = self.budget
+        free = np.flatnonzero(~self.alive[:budget])
+        if len(free) < len(kind):
+            # prioridade alta primeiro: quem sobra no fim são destroços/faíscas
+            order = np.argsort(-self.priority[kind], kind="stable")
+            kind, x, y = kind[order], x[order], y[order]
+        need = int(np.count_nonzero(self.priority[kind] > 0)) if len(free) < len(kind) else 0
+        if len(free) < need:
+            # efeito importante sem vaga: toma o lugar de destroços/faíscas vivos
+            steal = np.flatnonzero(self.alive[:budget] & (self.priority[self.kind[:budget]] == 0))
+            steal = steal[:need - len(free)]
+            self.alive[steal] = False
+            self.live -= len(steal)
+            free = np.concatenate((free, steal))
+        m = min(len(free), len(kind))
+        self.dropped += len(kind) - m
+        if m == 0:
+            return
+        free, kind = free[:m], kind[:m]
+        rng = self.rng
+        ang = np.radians(self.angle[kind] + (rng.random(m) - 0.5) * self.spread[kind])
+        spd = (self.speed_min[kind] + rng.random(m) * self.speed_span[kind]) * self.scale
+        life = self.life_tab[kind] * (1.0 + self.life_jitter[kind] * (rng.random(m) - 0.5))
+        self.x[free] = self.px[free] = x[:m]
+        self.y[free] = self.py[free] = y[:m]
+        self.vx[free] = np.cos(ang) * spd
+        self.vy[free] = np.sin(ang) * spd
+        self.age[free] = 0
+        self.life[free] = np.maximum(1, life.astype(np.int32))
+        self.kind[free] = kind
+        self.alive[free] = True
+        self.live += m
+        self.emitted += m
+
+    def update(self):
+        # move/envelhece os vivos e depois nasce o que foi emitido neste tick (idade 0)
+        if self.live:
+            idx = np.flatnonzero(self.alive)
+            kind = self.kind[idx]
+            self.px[idx] = x = self.x[idx]
+            self.py[idx] = y = self.y[idx]
+            vy = (self.vy[idx] + self.gravity[kind]) * self.drag[kind]
+            vx = self.vx[idx] * self.drag[kind]
+            self.vx[idx], self.vy[idx] = vx, vy
+            self.x[idx] = x + vx
+            self.y[idx] = y + vy
+            age = self.age[idx] + 1
+            self.age[idx] = age
+            dead = idx[age >= self.life[idx]]
+            self.alive[dead] = False
+            self.live -= len(dead)
+        if self._pending:
+            self._spawn()
+
+    def _blit_sources(self, atlas, view=None):
+        # (surface, área) de cada frame; com atlas, a página e o retângulo dele
+        if self._sources is None or self._sources_atlas != (atlas, view):
+            regions = atlas.regions if atlas else {}
+            frames = self.frames if view is None else [view.image(f) for f in self.frames]
+            self._sources = [regions.get(id(f), (f, None)) for f in frames]
+            self._sources_atlas = (atlas, view)
+        return self._sources
+
+    def draw(self, surface, alpha=1.0, atlas=None, view=None):
+        if self.live == 0:
+            return []
+        idx = np.flatnonzero(self.alive)
+        kind = self.kind[idx]
+        nfr = self.nframes[kind]
+        fid = self.base[kind] + np.minimum(self.age[idx] * nfr // self.life[idx], nfr - 1)
+        x, y = self.x[idx], self.y[idx]
+        if alpha < 1.0:
+            x = self.px[idx] + (x - self.px[idx]) * alpha
+            y = self.py[idx] + (y - self.py[idx]) * alpha
+        hw, hh = self.half_w[fid], self.half_h[fid]
+        if view is not None:
+            x, y, hw, hh = x * view.k, y * view.k, hw * view.k, hh * view.k
+        xs = (x - hw).astype(np.int32).tolist()
+        ys = (y - hh).astype(np.int32).tolist()
+        src = self._blit_sources(atlas, view)
+        seq = []
+        for f, px, py in zip(fid.tolist(), xs, ys):
+            img, area = src[f]
+            seq.append((img, (px, py), area))
+        return surface.blits(seq)
+
+    def stats(self):
+        return {"live": self.live, "budget": self.budget, "emitted": self.emitted, "dropped": self.dropped}
+
+# ---------------- Broad-phase de colisão ----------------
+# Hash espacial em grade uniforme, reconstruído a cada frame: cada teste só olha
+# os sprites das células que o retângulo cobre, em vez de O(N·M) colliderect.
+class SpatialHash:
+    def __init__(self, cell=64):
+        self.cell = max(1, int(cell))
+        self.cells = {}
+
+    def clear(self):
+        self.cells.clear()
+
+    def _span(self, rect):
+        c = self.cell
+        return rect.left // c, (rect.right - 1) // c, rect.top // c, (rect.bottom - 1) // c
+
+    def insert(self, spr):
+        x0, x1, y0, y1 = self._span(spr.rect)
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = [spr]
+                else:
+                    bucket.append(spr)
+
+    def build(self, sprites):
+        self.cells.clear()
+        for spr in sprites:
+            self.insert(spr)
+        return self
+
+    def query(self, rect):
+        # candidatos na ordem de inserção (determinístico), sem repetição
+        x0, x1, y0, y1 = self._span(rect)
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            return cells.get((x0, y0), ())
+        seen = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    for spr in bucket:
+                        seen[spr] = None
+        return seen
+
+    def spritecollide(self, sprite, dokill=False, collided=None):
+        # mesma semântica de pygame.sprite.spritecollide, contra o conteúdo da grade
+        rect = sprite.rect
+        hits = []
+        for spr in self.query(rect):
+            if not spr.alive() or not rect.colliderect(spr.rect):
+                continue
+            if collided is not None and not collided(sprite, spr):
+                continue
+            hits.append(spr)
+        if dokill:
+            for spr in hits:
+                spr.kill()
+        return hits
+
+    def groupcollide(self, group, dokill=False, collided=None):
+        # equivale a pygame.sprite.groupcollide(group, <grade>, False, dokill)
+        result = {}
+        for spr in group:
+            hits = self.spritecollide(spr, dokill, collided)
+            if hits:
+                result[spr] = hits
+        return result
+
+def _mask_for(image):
+    return ASSET_CACHE.get((id(image), None, "mask"), lambda: (image, pygame.mask.from_surface(image)))[1]
+
+def collide_mask_cached(a, b):
+    # narrow-phase por máscara; as máscaras ficam no cache junto com as imagens
+    ma, mb = _mask_for(a.image), _mask_for(b.image)
+    return ma.overlap(mb, (b.rect.x - a.rect.x, b.rect.y - a.rect.y)) is not None
+
+# ---------------- Fundo com parallax ----------------
+# Cada camada é reescalada UMA vez por tamanho de janela; por frame só há blits por offset.
+class ParallaxLayer:
+    def __init__(self, image, speed):
+        self.image = image          # surface original (sem escala)
+        self.speed = speed          # px por tick na escala base
+        self.enabled = True
+        self.offset = 0
+        self.prev = 0               # offset do tick anterior (interpolação)
+        self.drawn = 0              # offset usado no último draw (restore repinta igual)
+        self.scaled = None
+
+    def rescale(self, size, smooth=True):
+        if self.image is None:
+            self.scaled = None
+            return
+        fn = pygame.transform.smoothscale if smooth else pygame.transform.scale
+        self.scaled = fn(self.image, size)
+
+class ParallaxBackground:
+    def __init__(self, fill=(18, 24, 42)):
+        self.layers = []
+        self.fill = fill
+        self.size = None
+        self.scale = None
+        self.smooth = True
+        self.moved = True           # algo mudou desde o último draw?
+
+    def add_layer(self, image, speed, offset=0):
+        layer = ParallaxLayer(image, speed)
+        layer.offset = layer.prev = layer.drawn = offset
+        self.layers.append(layer)
+        self.size = None            # força rescale no próximo draw
+        return layer
+
+    def invalidate(self):
+        self.moved = True
+
+    def set_smooth(self, smooth):
+        if smooth != self.smooth:
+            self.smooth = smooth
+            self.size = None
+
+    def _ensure_scaled(self, size, scale):
+        if self.size == size and self.scale == scale:
+            return
+        self.size, self.scale = size, scale
+        for layer in self.layers:
+            layer.rescale(size, self.smooth)
+        self.moved = True
+
+    def update(self, scale, ticks=1):
+        # um passo de rolagem (um tick de lógica, ou um frame nos menus); ticks > 1 anda
+        # de uma vez o que os ticks pulados andariam
+        self._ensure_scaled(self.size or (WIDTH, HEIGHT), scale)     # tamanho do último draw
+        h = self.size[1]
+        for layer in self.layers:
+            layer.prev = layer.offset
+            if layer.enabled and layer.scaled is not None:
+                step = int(layer.speed * scale) * ticks
+                if step:
+                    layer.offset = (layer.offset + step) % h
+                    self.moved = True
+
+    def draw(self, surface, scale, alpha=1.0):
+        # offset desenhado = anterior + (atual - anterior) * alpha, como os sprites
+        self._ensure_scaled(surface.get_size(), scale)
+        h = self.size[1]
+        for layer in self.layers:
+            layer.drawn = int(layer.prev + (layer.offset - layer.prev) % h * alpha) % h
+        self._blit_layers(surface)
+        self.moved = False
+
+    def restore(self, surface, rect):
+        # repinta só o fundo sob `rect` (apaga o sprite do frame anterior)
+        clip = surface.get_clip()
+        surface.set_clip(rect)
+        self._blit_layers(surface)
+        surface.set_clip(clip)
+
+    def _blit_layers(self, surface):
+        h = self.size[1]
+        base_drawn = False
+        for layer in self.layers:
+            if not layer.enabled or layer.scaled is None:
+                continue
+            if not base_drawn and layer is not self.layers[0]:
+                surface.fill(self.fill)
+            base_drawn = True
+            surface.blit(layer.scaled, (0, layer.drawn - h))
+            surface.blit(layer.scaled, (0, layer.drawn))
+        if not base_drawn:
+            surface.fill(self.fill)
+
+# ---------------- Carregamento em segundo plano ----------------
+# Manifesto = tudo que existe em assets/images e assets/sounds. Uma thread decodifica
+# PNG/WAV/OGG enquanto o menu já está na tela; a conversão (convert_alpha) e o
+# aquecimento dos caches rodam na thread principal em install().
+SOUND_CACHE = {}
+
+def build_manifest():
+    items = []
+    pack = asset_pack()
+    if pack is not None:
+        for kind, folder in (("image", "images"), ("sound", "sounds")):
+            items += [(kind, name, None) for name in pack.names(folder)]
+        return items
+    for kind, folder, exts in (("image", IMG_DIR, (".png",)), ("sound", SND_DIR, (".wav", ".ogg"))):
+        try:
+            names = sorted(os.listdir(folder))
+        except OSError:
+            continue
+        for name in names:
+            if name.lower().endswith(exts) and not name.startswith("bgm_"):   # BGM é streaming
+                items.append((kind, name, os.path.join(folder, name)))
+    return items
+
+class AssetLoader:
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.total = len(manifest)
+        self.done = 0
+        self.results = {}
+        self.errors = []
+        self._thread = threading.Thread(target=self._work, name="asset-loader", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _work(self):
+        for kind, name, path in self.manifest:
+            obj = None
+            pack = asset_pack() if path is None else None
+            try:
+                if kind == "image":
+                    obj = pack.image(name) if pack else pygame.image.load(path)
+                elif pack:
+                    obj = pack.sound(name)
+                elif pygame.mixer.get_init():
+                    obj = pygame.mixer.Sound(path)
+            except (pygame.error, OSError) as e:
+                self.errors.append((name, str(e)))
+            self.results[(kind, name)] = obj
+            self.done += 1
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def finished(self):
+        return self.done >= self.total
+
+    def wait(self):
+        self._thread.join()
+
+    def install(self):
+        # thread principal: converte para o formato da tela e popula os caches
+        self.wait()
+        has_display = pygame.display.get_surface() is not None
+        for (kind, name), obj in self.results.items():
+            if kind == "image":
+                if obj is not None and has_display:
+                    obj = obj.convert_alpha()
+                ASSET_CACHE.put((name, 1.0, "raw"), obj)
+            else:
+                SOUND_CACHE[name] = obj
+
+def warm_sprite_cache(scale):
+    # instancia um de cada sprite: toda imagem escalada/fatiada fica pronta antes da partida
+    rng = random.Random(0)
+    sprites = [Player(scale=scale), Bullet(0, 0, scale=scale), HomingMissile(0, 0, scale=scale),
+               EnemyBullet(0, 0, scale=scale), Boss(scale=scale), Explosion((0, 0), scale=scale)]
+    sprites += [Enemy(kind, scale=scale, rng=rng) for kind in ("drone", "ufo", "fighter")]
+    if COLLISION_MASKS:
+        for spr in sprites:
+            for img in getattr(spr, "frames", [spr.image]):
+                _mask_for(img)
+    for name in PARTICLE_EMITTERS:
+        particle_frames(name, scale)
+    radius = max(sprites[0].rect.size) // 2 + 3
+    for d in range(-3, 4):
+        _shield_ring(radius + d)
+    return sprites
+
+# ---------------- Atlas de sprites ----------------
+# As imagens escaladas continuam existindo (colisão por máscara, HUD, fallback), mas o
+# desenho usa cópias empacotadas em poucas páginas: cada camada vira um único
+# Surface.blits com (página, destino, área), sem trocar de textura a cada sprite.
+class SpriteAtlas:
+    def __init__(self, max_size=ATLAS_MAX_SIZE, padding=1):
+        self.max_size = max_size
+        self.padding = padding
+        self.pages = []
+        self.regions = {}       # id(imagem) -> (página, Rect de origem)
+        self._images = []       # mantém as imagens vivas: os id() não podem ser reaproveitados
+
+    def clear(self):
+        self.pages = []
+        self.regions = {}
+        self._images = []
+
+    def build(self, images):
+        # empacotamento em prateleiras: mais altas primeiro, da esquerda para a direita
+        self.clear()
+        pad = self.padding
+        seen = set()
+        todo = []
+        for img in images:
+            if img is None or id(img) in seen:
+                continue
+            seen.add(id(img))
+            w, h = img.get_size()
+            if w + pad > self.max_size or h + pad > self.max_size:
+                continue    # grande demais: continua sendo desenhada sozinha
+            todo.append(img)
+        todo.sort(key=lambda im: (im.get_height(), im.get_width()), reverse=True)
+        area = sum((im.get_width() + pad) * (im.get_height() + pad) for im in todo)
+        widest = max((im.get_width() + pad for im in todo), default=1)
+        width = min(self.max_size, max(widest, int(math.sqrt(area) * 1.25)))
+        pages = []          # [(largura, altura usada, [(img, x, y), ...])]
+        placed, x, y, shelf = [], 0, 0, 0
+        for img in todo:
+            w, h = img.get_width() + pad, img.get_height() + pad
+            if x + w > width:
+                x, y, shelf = 0, y + shelf, 0
+            if y + h > self.max_size:
+                pages.append((width, y, placed))
+                placed, x, y, shelf = [], 0, 0, 0
+            placed.append((img, x, y))
+            x += w
+            shelf = max(shelf, h)
+        if placed:
+            pages.append((width, y + shelf, placed))
+        has_display = pygame.display.get_surface() is not None
+        for width, height, placed in pages:
+            page = pygame.Surface((width, max(1, height)), pygame.SRCALPHA)
+            if has_display:
+                page = page.convert_alpha()
+            page.fill((0, 0, 0, 0))
+            for img, x, y in placed:
+                # MAX sobre página transparente = cópia exata (blit normal misturaria o alfa)
+                page.blit(img, (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+                self.regions[id(img)] = (page, pygame.Rect(x, y, img.get_width(), img.get_height()))
+            self.pages.append(page)
+        self._images = todo
+        return self
+
+    def batch(self, seq):
+        # (imagem, destino) -> (página, destino, área); quem não está no atlas passa direto
+        regions = self.regions
+        out = []
+        for img, dest in seq:
+            reg = regions.get(id(img))
+            out.append((img, dest) if reg is None else (reg[0], dest, reg[1]))
+        return out
+
+    def stats(self):
+        return {"pages": len(self.pages), "images": len(self.regions),
+                "sizes": [p.get_size() for p in self.pages]}
+
+def build_sprite_atlas(scale, sprites=None, view=None):
+    # com view (canvas menor que o mundo) o atlas guarda as cópias que o desenho usa
+    sprites = sprites if sprites is not None else warm_sprite_cache(scale)
+    images = [_afterburner_flame()]
+    for spr in sprites:
+        images.extend(getattr(spr, "frames", [spr.image]))
+    for name in PARTICLE_EMITTERS:
+        images.extend(particle_frames(name, scale))
+    radius = max(sprites[0].rect.size) // 2 + 3     # sprites[0] é o Player
+    images.extend(_shield_ring(radius + d) for d in range(-3, 4))
+    if view is not None:
+        images = [view.image(img) for img in images]
+    return SpriteAtlas().build(images)
+
+# ---------------- Entradas ----------------
+# Bitmask por tick com tudo que a simulação lê do teclado.
+IN_LEFT, IN_RIGHT, IN_UP, IN_DOWN = 1, 2, 4, 8
+IN_FIRE = 16        # SPACE segurado
+IN_MISSILE = 32     # M apertado neste tick (borda, não nível)
+
+def read_inputs(keys=None, missile=False):
+    if keys is None:
+        keys = pygame.key.get_pressed()
+    bits = 0
+    if keys[pygame.K_LEFT] or keys[pygame.K_a]: bits |= IN_LEFT
+    if keys[pygame.K_RIGHT] or keys[pygame.K_d]: bits |= IN_RIGHT
+    if keys[pygame.K_UP] or keys[pygame.K_w]: bits |= IN_UP
+    if keys[pygame.K_DOWN] or keys[pygame.K_s]: bits |= IN_DOWN
+    if keys[pygame.K_SPACE]: bits |= IN_FIRE
+    if missile: bits |= IN_MISSILE
+    return bits
+
+def configure_view(scale):
+    # tamanho lógico do mundo; sprites e gameplay leem esses globais
+    globals()['GFX_SCALE'] = scale
+    globals()['WIDTH'] = int(BASE_W * scale)
+    globals()['HEIGHT'] = int(BASE_H * scale)
+
+# ---------------- Ondas e padrões de tiro ----------------
+# Roteiros declarativos (dicts no formato do JSON): spawns e padrões de tiro são
+# compilados antes da partida em linhas do tempo por tick, e o step só tira da fila
+# o que venceu. Cada padrão vira grupos (atraso, dx, ângulo) prontos para emitir.
+BULLET_PATTERNS = {
+    # row: tiros retos para baixo nos deslocamentos dx (velocidade inteira, o tiro clássico)
+    "single":   {"type": "row", "offsets": [0], "speed": 6},
+    "boss_fan": {"type": "row", "offsets": [-60, -30, 0, 30, 60], "speed": 6},
+    # fan: count tiros abertos em arc graus, para baixo ou mirando no player
+    "fan3":     {"type": "fan", "count": 3, "arc": 30, "speed": 5, "aim": True},
+    "fan7":     {"type": "fan", "count": 7, "arc": 90, "speed": 4},
+    # spiral: arms braços girando turn graus por tiro, um tiro a cada every ticks
+    "spiral":   {"type": "spiral", "arms": 3, "shots": 12, "every": 3, "turn": 12, "speed": 4},
+    # burst: shots tiros em sequência mirando no player (mira refeita a cada tiro)
+    "burst3":   {"type": "burst", "shots": 3, "every": 6, "speed": 7, "aim": True},
+}
+
+WAVE_SCRIPTS = {
+    # o jogo de sempre: mesmos sorteios na mesma ordem (replays antigos continuam valendo)
+    "classic": {
+        "endless": {"interval": [28, 14], "ramp": 150, "mix": {"drone": 6, "ufo": 4}},
+        "fire": {"drone": {"pattern": "single", "cooldown": [60, 120]},
+                 "ufo": {"pattern": "single", "cooldown": [60, 120]}},
+        "boss": {"first": 400, "every": 500, "cooldown": 40, "patterns": ["boss_fan"]},
+    },
+    # caças em formação, leques, espirais e rajadas mirando no player
+    "assault": {
+        "endless": {"interval": [32, 16], "ramp": 180, "mix": {"drone": 6, "ufo": 3, "fighter": 1}},
+        "waves": [
+            {"at": 600, "kind": "fighter", "x": [0.25, 0.5, 0.75], "every": 0, "repeat": 1800},
+            {"at": 1200, "kind": "ufo", "x": [0.1, 0.3, 0.5, 0.7, 0.9], "every": 8, "repeat": 1800},
+        ],
+        "fire": {"drone": {"pattern": "single", "cooldown": [60, 120]},
+                 "ufo": {"pattern": "fan3", "cooldown": [80, 140]},
+                 "fighter": {"pattern": "burst3", "cooldown": [90, 150]}},
+        "boss": {"first": 400, "every": 500, "cooldown": 40, "patterns": ["boss_fan", "spiral", "fan7", "burst3"]},
+    },
+}
+
+class BulletPattern:
+    # groups: [(atraso, [dx...], [ângulo relativo...]), ...] em ordem de atraso
+    def __init__(self, spec):
+        kind = spec["type"]
+        self.row = kind == "row"
+        self.aim = bool(spec.get("aim", False))
+        self.speed = spec["speed"]
+        shots = {}
+        if kind == "row":
+            shots[0] = [(dx, 0.0) for dx in spec["offsets"]]
+        elif kind == "fan":
+            n, arc = spec["count"], spec["arc"]
+            shots[0] = [(0, -arc / 2 + arc * i / max(1, n - 1)) for i in range(n)]
+        elif kind == "spiral":
+            arms = spec["arms"]
+            for i in range(spec["shots"]):
+                shots[i * spec["every"]] = [(0, i * spec["turn"] + a * 360.0 / arms) for a in range(arms)]
+        elif kind == "burst":
+            for i in range(spec["shots"]):
+                shots[i * spec["every"]] = [(0, 0.0)]
+        else:
+            raise ValueError(f"padrão de tiro desconhecido: {kind}")
+        self.groups = [(d, [dx for dx, _ in g], [a for _, a in g]) for d, g in sorted(shots.items())]
+
+class Timeline:
+    # eventos (tick, op) em ordem; loop > 0 repete tudo a cada `loop` ticks
+    def __init__(self, events, loop=0):
+        self.events = sorted(events, key=lambda e: e[0])
+        self.loop = loop
+        self.restart()
+
+    def restart(self):
+        self.i = 0
+        self.base = 0
+        self.next = self.events[0][0] if self.events else float("inf")
+
+    def pop(self, frame):
+        out = []
+        ev = self.events
+        while self.next <= frame:
+            out.append(ev[self.i][1])
+            self.i += 1
+            if self.i == len(ev):
+                if not self.loop:
+                    self.next = float("inf")
+                    break
+                self.i = 0
+                self.base += self.loop
+            self.next = ev[self.i][0] + self.base
+        return out
+
+def _endless_timelines(spec, scale):
+    # mesma regra do spawn_timer original (intervalo cai de hi para lo com a dificuldade),
+    # resolvida tick a tick até estabilizar no piso; depois vira uma linha em loop
+    hi, lo = int(spec["interval"][0] * scale), max(1, int(spec["interval"][1] * scale))
+    ramp = spec["ramp"]
+    op = ("mix", list(spec["mix"]), list(spec["mix"].values()))
+    ticks, timer, t = [], 0, 0
+    while True:
+        t += 1
+        timer += 1
+        if timer >= max(lo, hi - t // ramp):
+            ticks.append(t)
+            timer = 0
+            if hi - t // ramp <= lo:
+                break
+    return [Timeline([(tk, op) for tk in ticks]), Timeline([(ticks[-1] + lo, op)], loop=lo)]
+
+class WaveScript:
+    def __init__(self, script, scale=1.0, name="custom"):
+        self.name = name
+        patterns = dict(BULLET_PATTERNS, **script.get("patterns", {}))
+        self.patterns = {k: BulletPattern(v) for k, v in patterns.items()}
+        self.pattern_names = {v: k for k, v in self.patterns.items()}
+        self.tracks = []
+        if "endless" in script:
+            self.tracks += _endless_timelines(script["endless"], scale)
+        for w in script.get("waves", []):
+            xs = w.get("x") or [None] * w.get("count", 1)
+            every = w.get("every", 0)
+            events = [(w["at"] + i * every, ("spawn", w["kind"], x)) for i, x in enumerate(xs)]
+            self.tracks.append(Timeline(events, loop=w.get("repeat", 0)))
+        self.fire = {k: (self.patterns[v["pattern"]], tuple(v["cooldown"])) for k, v in script.get("fire", {}).items()}
+        boss = script.get("boss", {})
+        self.boss_first = boss.get("first", 400)
+        self.boss_every = boss.get("every", 500)
+        self.boss_cooldown = boss.get("cooldown", 40)
+        self.boss_patterns = [self.patterns[n] for n in boss.get("patterns", ["boss_fan"])]
+
+    def restart(self):
+        for tr in self.tracks:
+            tr.restart()
+
+def load_waves(name, scale=1.0):
+    # nome de um roteiro embutido ou caminho de um .json no mesmo formato
+    if name in WAVE_SCRIPTS:
+        return WaveScript(WAVE_SCRIPTS[name], scale, name)
+    import json
+    with open(name, encoding="utf-8") as f:
+        return WaveScript(json.load(f), scale, name)
+
+# ---------------- Simulação ----------------
+# Toda a lógica de jogo, sem janela, relógio ou som: step(inputs) avança um tick.
+# Sons viram eventos em self.events para quem estiver apresentando o jogo.
+class Simulation:
+    def __init__(self, scale=1.0, seed=None, rng=None, entity_store=None, particles=None, waves=None):
+        self.scale = scale
+        self.waves = load_waves(waves or WAVES, scale)
+        self.seed = seed
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.events = []
+        self.frame = 0
+        self.profiler = NULL_PROFILER
+
+        # pools pré-aquecidos: luta de boss longa não aloca sprite nenhum por frame
+        self.pools = {
+            Bullet: SpritePool(Bullet, POOL_SIZES["bullet"]),
+            EnemyBullet: SpritePool(EnemyBullet, POOL_SIZES["enemy_bullet"]),
+            HomingMissile: SpritePool(HomingMissile, POOL_SIZES["missile"]),
+            Explosion: SpritePool(Explosion, POOL_SIZES["explosion"]),
+        }
+        for cls, pool in self.pools.items():
+            args = ((0, 0),) if cls is Explosion else (0, 0)
+            pool.prewarm(*args, scale=self.scale)
+
+        cell = COLLISION_CELL * self.scale
+        self.grid_enemies = SpatialHash(cell)
+        self.grid_bullets = SpatialHash(cell)
+        self.grid_missiles = SpatialHash(cell)
+        self.grid_enemy_bullets = SpatialHash(cell)
+        self.collided = collide_mask_cached if COLLISION_MASKS else None
+
+        # tiros inimigos e mísseis guiados vetorizados (teste só por retângulo, sem máscara);
+        # inimigos continuam sprites: fila de disparo, emissores e alvos apontam para eles
+        self.bullet_store = None
+        self.missile_store = None
+        if entity_store is None:
+            entity_store = ENTITY_STORE
+        if entity_store and np is not None:
+            img = sprite_image("enemy_bullet.png", scale, _enemy_bullet_fallback)
+            self.bullet_store = EntityStore(POOL_SIZES["enemy_bullet"] * 4, img)
+            img = sprite_image("missile.png", scale, _missile_fallback)
+            self.missile_store = EntityStore(POOL_SIZES["missile"], img, speed=8 * scale)
+
+        self.enemy_bullet_cap = None    # teto de tiros inimigos vivos (governador, nível mais baixo)
+        self.engine_flames = True
+        # efeitos em partículas; sem NumPy as explosões voltam a ser sprites do pool
+        self.particles = None
+        if particles is None:
+            particles = PARTICLES
+        if particles and np is not None:
+            self.particles = ParticleSystem(PARTICLE_BUDGET, scale)
+
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            # partida nova reprodutível (replays)
+            self.seed = seed
+            self.rng.seed(seed)
+        self.frame = 0
+        # devolve aos pools o que ficou vivo da partida anterior
+        for spr in list(getattr(self, "all", ())):
+            spr.kill()
+        self.all = pygame.sprite.Group()
+        self.enemies = pygame.sprite.Group()
+        self.enemy_bullets = pygame.sprite.Group()
+        self.bullets = pygame.sprite.Group()
+        self.missiles = pygame.sprite.Group()
+        self.effects = pygame.sprite.Group()
+        self.boss_group = pygame.sprite.Group()
+
+        self.player = Player(scale=self.scale)
+        self.all.add(self.player)
+        if self.particles is not None:
+            self.particles.reset(self.seed)
+        self.score = 0
+        self.combo = 0
+        self.combo_timer = 0
+        self.fire_cooldown = 0
+        self.next_boss_score = self.waves.boss_first
+        self.waves.restart()
+        self.fire_queue = []        # (tick, ordem de spawn, inimigo): próximo disparo de cada um
+        self.emissions = []         # (tick, n, padrão, dxs, ângulos, emissor): tiros atrasados de padrões
+        self._seq = 0
+        self.over = False
+        self.events.clear()
+        if self.bullet_store is not None:
+            self.bullet_store.clear()
+            self.missile_store.clear()
+
+    def step(self, inputs=0):
+        self.events.clear()
+        self.frame += 1
+        rng = self.rng
+        player = self.player
+        prof = self.profiler
+        t = prof.clock()
+
+        if inputs & IN_MISSILE:
+            self.launch_missile()
+
+        player.update(inputs)
+
+        # tiro infinito
+        if self.fire_cooldown > 0: self.fire_cooldown -= 1
+        if inputs & IN_FIRE and self.fire_cooldown == 0:
+            self.shoot()
+            self.fire_cooldown = int(6*self.scale)
+        t = prof.lap("player", t)
+
+        # spawns (linhas do tempo do roteiro) e boss
+        frame = self.frame
+        for track in self.waves.tracks:
+            if track.next <= frame:
+                for op in track.pop(frame):
+                    if op[0] == "mix":
+                        self.spawn_enemy(rng.choices(op[1], weights=op[2])[0])
+                    else:
+                        self.spawn_enemy(op[1], op[2])
+
+        if self.score >= self.next_boss_score and len(self.boss_group) == 0:
+            b = Boss(scale=self.scale)
+            self.boss_group.add(b); self.all.add(b)
+            self.next_boss_score += self.waves.boss_every
+        t = prof.lap("spawn", t)
+
+        # updates
+        self.bullets.update(); self.missiles.update()
+        self.enemies.update(); self.enemy_bullets.update()
+        self.effects.update(); self.boss_group.update()
+        if self.bullet_store is not None:
+            self.bullet_store.update(WIDTH, HEIGHT)
+            self.missile_store.update(WIDTH, HEIGHT, margin=40)
+        t = prof.lap("update", t)
+
+        # inimigos atiram: só os que venceram na fila (na ordem de spawn, como antes)
+        queue = self.fire_queue
+        fire = self.waves.fire
+        while queue and queue[0][0] <= frame:
+            _, seq, e = heapq.heappop(queue)
+            if not e.alive():
+                continue
+            if e.rect.top <= 0:
+                heapq.heappush(queue, (frame + 1, seq, e))     # ainda entrando na tela
+                continue
+            pattern, cooldown = fire[e.kind]
+            heapq.heappush(queue, (frame + rng.randint(*cooldown), seq, e))
+            self.fire_pattern(pattern, e)
+            if rng.random() < 0.3:
+                self.events.append("flak")
+
+        # boss atira
+        for b in self.boss_group:
+            if b.entered and b.shoot_cd <= 0:
+                b.shoot_cd = self.waves.boss_cooldown
+                patterns = self.waves.boss_patterns
+                self.fire_pattern(patterns[b.volley % len(patterns)], b)
+                b.volley += 1
+
+        # tiros atrasados (espirais, rajadas) que venceram neste tick
+        pending = self.emissions
+        while pending and pending[0][0] <= frame:
+            _, _, pattern, dxs, angles, emitter = heapq.heappop(pending)
+            if emitter.alive():
+                self._emit(pattern, dxs, angles, emitter)
+        t = prof.lap("enemy_fire", t)
+
+        # colisões (broad-phase pela grade; mortos saem via alive())
+        hit = self.collided
+        self.grid_bullets.build(self.bullets)
+        self.grid_missiles.build(self.missiles)
+        self.grid_enemy_bullets.build(self.enemy_bullets)
+        for enemy, shots in self.grid_bullets.groupcollide(self.enemies, True, hit).items():
+            self.sparks(shots)
+            enemy.hp -= 1
+            if enemy.hp <= 0:
+                self.kill_enemy(enemy)
+        for enemy in self.grid_missiles.groupcollide(self.enemies, True, hit):
+            enemy.hp -= 3
+            if enemy.hp <= 0:
+                self.kill_enemy(enemy)
+        mstore = self.missile_store if self.missile_store is not None and len(self.missile_store) else None
+        if mstore is not None:
+            for enemy in list(self.enemies):
+                if len(mstore.collide_rect(enemy.rect, damage=1)):
+                    enemy.hp -= 3
+                    if enemy.hp <= 0:
+                        self.kill_enemy(enemy)
+
+        for b in self.boss_group:
+            shots = self.grid_bullets.spritecollide(b, True, hit)
+            if shots:
+                self.sparks(shots)
+                b.hp -= 1
+            if (self.grid_missiles.spritecollide(b, True, hit) or
+                    (mstore is not None and len(mstore.collide_rect(b.rect, damage=1)))):
+                b.hp -= 5
+            if b.hp <= 0:
+                self.score += 350
+                for _ in range(6):
+                    self.explode((b.rect.centerx + rng.randint(-40, 40), b.rect.centery + rng.randint(-20, 20)))
+                self.events.append("explosion")
+                b.kill()
+
+        # dano no player
+        if player.invuln == 0:
+            self.grid_enemies.build(self.enemies)
+            if (self.grid_enemies.spritecollide(player, True, hit) or
+                pygame.sprite.spritecollide(player, self.boss_group, False, hit) or
+                self.grid_enemy_bullets.spritecollide(player, True, hit) or
+                (self.bullet_store is not None and len(self.bullet_store.collide_rect(player.rect, damage=1)))):
+                if player.shield_timer > 0:
+                    player.shield_timer = 0
+                else:
+                    player.lives -= 1
+                    player.invuln = int(90*self.scale)
+                    self.combo = 0; self.combo_timer = 0
+                    if player.lives <= 0:
+                        self.over = True
+        t = prof.lap("collision", t)
+
+        # partículas (só visual): chama das turbinas + o que foi emitido neste tick
+        if self.particles is not None:
+            if self.engine_flames:
+                for x, y in player.engine_points():
+                    self.particles.emit("flame", x, y)
+            self.particles.update()
+            prof.lap("particles", t)
+        return self.events
+
+    def entity_counts(self):
+        counts = {"enemies": len(self.enemies), "boss": len(self.boss_group),
+                  "bullets": len(self.bullets), "missiles": len(self.missiles),
+                  "enemy_bullets": len(self.enemy_bullets), "effects": len(self.effects)}
+        if self.bullet_store is not None:
+            counts["enemy_bullets"] += len(self.bullet_store)
+            counts["missiles"] += len(self.missile_store)
+        if self.particles is not None:
+            counts["particles"] = len(self.particles)
+        return counts
+
+    def pool_stats(self):
+        return {cls.__name__: pool.stats() for cls, pool in self.pools.items()}
+
+    def snapshot(self):
+        # partida inteira num buffer binário; imagens vão por chave (tipo do inimigo,
+        # frame da explosão), nunca pixels. O RNG vai junto: restore() + as mesmas
+        # entradas refazem os mesmos ticks.
+        enemies, bosses = list(self.enemies), list(self.boss_group)
+        ref = {s: i for i, s in enumerate(enemies + bosses)}
+        keys = {}
+        body = bytearray()
+        def key(name):
+            return keys.setdefault(name, len(keys))
+        def table(st, rows):
+            body.extend(_SNAP_COUNT.pack(len(rows)))
+            for row in rows:
+                body.extend(st.pack(*row))
+
+        p = self.player
+        body += _SNAP_SIM.pack(self.score, self.combo, self.combo_timer, self.fire_cooldown,
+                               self.next_boss_score, self.over, self._seq)
+        body += _SNAP_PLAYER.pack(p.rect.x, p.rect.y, p.lives, p.invuln, p.shield_timer, p.missiles, p.missile_cd)
+        _, words, gauss = self.rng.getstate()
+        body += _SNAP_RNG.pack(*words, gauss is not None, gauss or 0.0)
+        table(_SNAP_TIMELINE, [(t.i, t.base, t.next) for t in self.waves.tracks])
+        table(_SNAP_ENEMY, [(key(e.kind), e.rect.x, e.rect.y, e.speedx, e.speedy, e.hp, e.shoot_cd, e.seq)
+                            for e in enemies])
+        table(_SNAP_BOSS, [(b.rect.x, b.rect.y, b.hp, b.max_hp, b.t, b.entered, b.shoot_cd, b.volley)
+                           for b in bosses])
+        table(_SNAP_BULLET, [(b.rect.x, b.rect.y, b.speed) for b in self.bullets])
+        # alvo morto ou sem alvo dão no mesmo no update do míssil: -1
+        table(_SNAP_MISSILE, [(m.rect.x, m.rect.y, m.vx, m.vy, ref.get(m.target, -1)) for m in self.missiles])
+        table(_SNAP_ENEMY_BULLET, [(b.rect.x, b.rect.y, b.vx, b.vy, b.fx, b.fy) for b in self.enemy_bullets])
+        table(_SNAP_EXPLOSION, [(x.rect.x, x.rect.y, x.idx, x.timer) for x in self.effects])
+        # filas em ordem (lista ordenada já é um heap); entradas de quem morreu seriam
+        # descartadas no pop, então nem entram
+        table(_SNAP_FIRE, sorted((t, seq, ref[e]) for t, seq, e in self.fire_queue if e in ref))
+        names = self.waves.pattern_names
+        table(_SNAP_EMISSION, sorted((t, n, key(names[pat]), next(i for i, g in enumerate(pat.groups) if g[1] is dxs), ref[em])
+                                     for t, n, pat, dxs, _, em in self.emissions if em in ref))
+
+        flags = 0
+        if self.bullet_store is not None:
+            # tiros inimigos e depois mísseis (com o alvo de cada slot como referência)
+            flags |= SNAP_STORE
+            for store in (self.bullet_store, self.missile_store):
+                body += _SNAP_COUNT32.pack(store.n)
+                for name in store.FIELDS:
+                    body += getattr(store, name)[:store.n].tobytes()
+                body += np.array([ref.get(t, -1) for t in store.target[:store.n].tolist()], np.int32).tobytes()
+        parts = self.particles
+        if parts is not None:
+            # vivas nos mesmos slots (a ordem decide quem é roubado/reaproveitado) + RNG próprio
+            flags |= SNAP_PARTICLES
+            idx = np.flatnonzero(parts.alive)
+            body += _SNAP_COUNT32.pack(len(idx))
+            body += idx.astype(np.int32).tobytes()
+            for name in parts.STATE:
+                body += getattr(parts, name)[idx].tobytes()
+            st = parts.rng.bit_generator.state
+            state, inc = st["state"]["state"], st["state"]["inc"]
+            body += _SNAP_PARTICLE_RNG.pack(state & _U64, state >> 64, inc & _U64, inc >> 64,
+                                            st["has_uint32"], st["uinteger"])
+
+        # cabeçalho: nome do roteiro e a tabela de chaves usada pelos registros acima
+        head = bytearray(_SNAP_HEADER.pack(SNAP_MAGIC, SNAP_VERSION, flags, self.scale, self.frame))
+        def put(name):
+            raw = name.encode("utf-8")
+            head.extend(_SNAP_COUNT.pack(len(raw)))
+            head.extend(raw)
+        put(self.waves.name)
+        head.extend(_SNAP_COUNT.pack(len(keys)))
+        for name in keys:
+            put(name)
+        return bytes(head + body)
+
+    def restore(self, data):
+        # volta ao estado de snapshot(); precisa da mesma escala, roteiro e modo de tiros
+        info = snapshot_info(data)
+        if info["scale"] != self.scale or info["waves"] != self.waves.name:
+            raise ValueError("snapshot de outra escala ou de outro roteiro de ondas")
+        if info["store"] != (self.bullet_store is not None):
+            raise ValueError("snapshot e simulação discordam sobre o EntityStore")
+        keys = info["keys"]
+        view = memoryview(data)
+        pos = info["size"]
+        def read(st):
+            nonlocal pos
+            row = st.unpack_from(view, pos)
+            pos += st.size
+            return row
+        def rows(st):
+            nonlocal pos
+            n, = read(_SNAP_COUNT)
+            end = pos + n * st.size
+            out = st.iter_unpack(view[pos:end])
+            pos = end
+            return out
+        def array(dtype, n):
+            nonlocal pos
+            arr = np.frombuffer(view, dtype, n, pos)
+            pos += arr.nbytes
+            return arr
+
+        # o que está vivo volta para os pools; o player é o mesmo objeto
+        for spr in list(self.all):
+            if spr is not self.player:
+                spr.kill()
+        self.events.clear()
+        (self.score, self.combo, self.combo_timer, self.fire_cooldown,
+         self.next_boss_score, over, self._seq) = read(_SNAP_SIM)
+        self.over = bool(over)
+        p = self.player
+        p.rect.x, p.rect.y, p.lives, p.invuln, p.shield_timer, p.missiles, p.missile_cd = read(_SNAP_PLAYER)
+        rng_state = read(_SNAP_RNG)
+        tracks = self.waves.tracks
+        saved = list(rows(_SNAP_TIMELINE))
+        if len(saved) != len(tracks):
+            raise ValueError("snapshot de outro roteiro de ondas")
+        for tr, (i, base, nxt) in zip(tracks, saved):
+            tr.i, tr.base = i, base
+            tr.next = nxt if math.isinf(nxt) else int(nxt)
+
+        # Enemy() sorteia posição/velocidade, mas o RNG volta ao estado salvo no fim
+        scale = self.scale
+        refs = []
+        for k, x, y, sx, sy, hp, cd, seq in rows(_SNAP_ENEMY):
+            e = Enemy(keys[k], scale=scale, rng=self.rng, x=0)
+            e.rect.topleft = (x, y)
+            e.speedx, e.speedy, e.hp, e.shoot_cd, e.seq = sx, sy, hp, cd, seq
+            refs.append(e)
+        self.enemies.add(refs)
+        for x, y, hp, max_hp, t, entered, cd, volley in rows(_SNAP_BOSS):
+            b = Boss(scale=scale)
+            b.rect.topleft = (x, y)
+            b.hp, b.max_hp, b.t, b.entered, b.shoot_cd, b.volley = hp, max_hp, t, bool(entered), cd, volley
+            self.boss_group.add(b)
+            refs.append(b)
+        self.all.add(refs)
+        pool = self.pools[Bullet]
+        for x, y, speed in rows(_SNAP_BULLET):
+            b = pool.acquire(0, 0, scale=scale)
+            b.rect.topleft = (x, y)
+            b.speed = speed
+            self.bullets.add(b); self.all.add(b)
+        pool = self.pools[HomingMissile]
+        for x, y, vx, vy, target in rows(_SNAP_MISSILE):
+            m = pool.acquire(0, 0, scale=scale)
+            m.rect.topleft = (x, y)
+            m.vx, m.vy = vx, vy
+            m.target = refs[target] if target >= 0 else None
+            self.missiles.add(m); self.all.add(m)
+        pool = self.pools[EnemyBullet]
+        for x, y, vx, vy, fx, fy in rows(_SNAP_ENEMY_BULLET):
+            b = pool.acquire(0, 0, scale=scale, vx=vx, vy=vy)
+            b.rect.topleft = (x, y)
+            b.fx, b.fy = fx, fy
+            self.enemy_bullets.add(b); self.all.add(b)
+        pool = self.pools[Explosion]
+        for x, y, idx, timer in rows(_SNAP_EXPLOSION):
+            boom = pool.acquire((0, 0), scale=scale)
+            boom.idx, boom.timer = idx, timer
+            boom.image = boom.frames[idx]
+            boom.rect.size = boom.image.get_size()
+            boom.rect.topleft = (x, y)
+            self.effects.add(boom); self.all.add(boom)
+
+        self.fire_queue = [(t, seq, refs[i]) for t, seq, i in rows(_SNAP_FIRE)]
+        patterns = self.waves.patterns
+        self.emissions = []
+        for t, n, k, g, i in rows(_SNAP_EMISSION):
+            pat = patterns[keys[k]]
+            _, dxs, angles = pat.groups[g]
+            self.emissions.append((t, n, pat, dxs, angles, refs[i]))
+
+        if self.bullet_store is not None:
+            for store in (self.bullet_store, self.missile_store):
+                n, = read(_SNAP_COUNT32)
+                store.clear()
+                if n > store.capacity:
+                    store._alloc(n)
+                for name, dtype in store.FIELDS.items():
+                    getattr(store, name)[:n] = array(dtype, n)
+                store.target[:n] = [refs[i] if i >= 0 else None for i in array(np.int32, n).tolist()]
+                store.n = n
+        parts = self.particles
+        if parts is not None:
+            parts.reset(self.seed)
+        if info["particles"]:
+            n, = read(_SNAP_COUNT32)
+            idx = array(np.int32, n)
+            cols = [(name, array(dtype, n)) for name, dtype in ParticleSystem.STATE.items()]
+            s_lo, s_hi, i_lo, i_hi, has_uint32, uinteger = read(_SNAP_PARTICLE_RNG)
+            if parts is not None:
+                if n and idx.max() >= parts.capacity:
+                    raise ValueError("snapshot de um sistema de partículas maior")
+                for name, arr in cols:
+                    getattr(parts, name)[idx] = arr
+                parts.alive[idx] = True
+                parts.live = n
+                parts.rng.bit_generator.state = {
+                    "bit_generator": "PCG64",
+                    "state": {"state": s_hi << 64 | s_lo, "inc": i_hi << 64 | i_lo},
+                    "has_uint32": has_uint32, "uinteger": uinteger}
+
+        self.frame = info["frame"]
+        self.rng.setstate((self.rng.getstate()[0], rng_state[:-2], rng_state[-1] if rng_state[-2] else None))
+
+    def draw_layers(self):
+        # ordem de desenho, de baixo para cima
+        return (self.boss_group, self.enemies, self.enemy_bullets, self.bullets,
+                self.missiles, (self.player,), self.effects)
+
+    def find_nearest_target(self, pos):
+        candidates = list(self.enemies) + list(self.boss_group)
+        if not candidates:
+            return None
+        px, py = pos
+        best = min(candidates, key=lambda s: (s.rect.centerx - px)**2 + (s.rect.centery - py)**2)
+        return best
+
+    def spawn_enemy(self, kind, x=None):
+        rng = self.rng
+        e = Enemy(kind, scale=self.scale, rng=rng, x=x)
+        self._seq += 1
+        e.seq = self._seq
+        self.enemies.add(e); self.all.add(e)
+        spec = self.waves.fire.get(kind)
+        if spec is not None:
+            cd = e.shoot_cd if e.shoot_cd != 9999 else rng.randint(*spec[1])
+            # o tiro sai no tick em que o contador antigo chegaria a zero (update conta o tick do spawn)
+            heapq.heappush(self.fire_queue, (self.frame + cd - 1, e.seq, e))
+        return e
+
+    def fire_pattern(self, pattern, emitter):
+        for delay, dxs, angles in pattern.groups:
+            if delay == 0:
+                self._emit(pattern, dxs, angles, emitter)
+            else:
+                self._seq += 1
+                heapq.heappush(self.emissions, (self.frame + delay, self._seq, pattern, dxs, angles, emitter))
+
+    def _emit(self, pattern, dxs, angles, emitter):
+        ox, oy = emitter.rect.centerx, emitter.rect.bottom
+        if pattern.row:
+            for dx in dxs:
+                self.fire_enemy_bullet(ox + dx, oy)
+            return
+        base = 90.0
+        if pattern.aim:
+            p = self.player.rect
+            base = math.degrees(math.atan2(p.centery - oy, p.centerx - ox))
+        speed = pattern.speed * self.scale
+        rads = [math.radians(base + a) for a in angles]
+        self.fire_enemy_bullets([ox + dx for dx in dxs], [oy] * len(dxs),
+                                [math.cos(r) * speed for r in rads], [math.sin(r) * speed for r in rads])
+
+    def fire_enemy_bullets(self, xs, ys, vxs, vys):
+        # leva de tiros com velocidade própria; no EntityStore entra tudo de uma vez
+        cap = self.enemy_bullet_cap
+        if cap is not None:
+            room = cap - len(self.enemy_bullets) - (len(self.bullet_store) if self.bullet_store is not None else 0)
+            if room < len(xs):
+                xs, ys, vxs, vys = xs[:room], ys[:room], vxs[:room], vys[:room]
+        if not xs:
+            return
+        if self.bullet_store is not None:
+            self.bullet_store.spawn_many(xs, ys, vxs, vys)
+            return
+        pool = self.pools[EnemyBullet]
+        for x, y, vx, vy in zip(xs, ys, vxs, vys):
+            b = pool.acquire(x, y, scale=self.scale, vx=vx, vy=vy)
+            self.enemy_bullets.add(b); self.all.add(b)
+
+    def fire_enemy_bullet(self, x, y):
+        cap = self.enemy_bullet_cap
+        if cap is not None:
+            alive = len(self.enemy_bullets) + (len(self.bullet_store) if self.bullet_store is not None else 0)
+            if alive >= cap:
+                return
+        if self.bullet_store is not None:
+            self.bullet_store.spawn(x, y, vy=int(6 * self.scale))
+            return
+        b = self.pools[EnemyBullet].acquire(x, y, scale=self.scale)
+        self.enemy_bullets.add(b); self.all.add(b)
+
+    def launch_missile(self):
+        player = self.player
+        if player.missiles <= 0 or player.missile_cd != 0:
+            return
+        if self.missile_store is not None:
+            x, y = player.rect.centerx, player.rect.top
+            target = self.find_nearest_target((x, y))
+            self.missile_store.spawn(x, y, vy=-8 * self.scale, homing=True, target=target)
+        else:
+            m = self.pools[HomingMissile].acquire(player.rect.centerx, player.rect.top, scale=self.scale)
+            target = self.find_nearest_target(m.rect.center)
+            m.target = target
+            self.missiles.add(m); self.all.add(m)
+        if target:
+            self.events.append("lock")
+        player.missiles -= 1
+        player.missile_cd = int(40*self.scale)
+        self.events.append("missile")
+        self.events.append("flyby")
+
+    def explode(self, center):
+        if self.particles is not None:
+            self.particles.emit("explosion", *center)
+            self.particles.emit("debris", *center)
+            return
+        boom = self.pools[Explosion].acquire(center, scale=self.scale)
+        self.effects.add(boom); self.all.add(boom)
+
+    def sparks(self, shots):
+        if self.particles is not None:
+            for shot in shots:
+                self.particles.emit("spark", *shot.rect.midtop)
+
+    def kill_enemy(self, enemy):
+        self.score += 10
+        self.explode(enemy.rect.center)
+        self.events.append("explosion")
+        enemy.kill()
+
+    def shoot(self):
+        cx, cy = self.player.rect.centerx, self.player.rect.top
+        pool = self.pools[Bullet]
+        b1 = pool.acquire(cx - int(8*self.scale), cy, scale=self.scale)
+        b2 = pool.acquire(cx + int(8*self.scale), cy, scale=self.scale)
+        self.bullets.add(b1, b2); self.all.add(b1, b2)
+        self.events.append("shoot")
+
+# ---------------- Runner headless ----------------
+# Roda a simulação sem janela nem relógio, o mais rápido possível
+# (balanceamento em massa, replays de regressão, soak em CI).
+def autopilot(seed=None):
+    # entradas pseudo-aleatórias reprodutíveis: atira sempre, muda de direção a cada 30 ticks
+    rng = random.Random(seed)
+    state = {"move": 0}
+    dirs = (0, IN_LEFT, IN_RIGHT, IN_UP, IN_DOWN, IN_LEFT | IN_UP, IN_RIGHT | IN_UP)
+    def policy(sim, frame):
+        if frame % 30 == 0:
+            state["move"] = rng.choice(dirs)
+        bits = state["move"] | IN_FIRE
+        if frame % 120 == 60:
+            bits |= IN_MISSILE
+        return bits
+    return policy
+
+def run_headless(frames, seed=0, policy=None, scale=1.0, sim=None, profiler=None,
+                 stop_on_over=False, entity_store=None, waves=None):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    configure_view(scale)
+    if sim is None:
+        # partículas são só visuais: sem janela não há por que simulá-las
+        sim = Simulation(scale=scale, seed=seed, entity_store=entity_store, particles=False, waves=waves)
+    if policy is None:
+        policy = autopilot(seed)
+    prof = profiler or NULL_PROFILER
+    sim.profiler = prof
+    games, best, done = 1, 0, 0
+    t0 = time.perf_counter()
+    for f in range(frames):
+        prof.frame_begin()
+        sim.step(policy(sim, f))
+        prof.frame_end(sim.entity_counts() if prof.enabled else None)
+        done += 1
+        if sim.over:
+            if stop_on_over:
+                break
+            best = max(best, sim.score)
+            games += 1
+            sim.reset()
+    elapsed = time.perf_counter() - t0
+    best = max(best, sim.score)
+    return {"frames": done, "seed": seed, "elapsed_s": elapsed,
+            "fps": done / elapsed if elapsed > 0 else float("inf"),
+            "games": games, "best": best, "score": sim.score, "sim": sim}
+
+# ---------------- Replays ----------------
+# Formato binário compacto: cabeçalho (seed, escala, tick rate, score final), nome do
+# roteiro de ondas (v2; tamanho em 2 bytes desde a v3, cabe caminho de .json longo) + bitmask de entradas por tick em RLE (varint) comprimido com
+# zlib. Com a mesma seed, o mesmo roteiro e as mesmas entradas a simulação refaz a
+# partida tick a tick.
+REPLAY_MAGIC = b"SPFR"
+REPLAY_VERSION = 3
+_REPLAY_HEADER = struct.Struct("<4sBBHdQIi")   # magic, versão, flags, tick rate, escala, seed, ticks, score
+_REPLAY_NAME = struct.Struct("<H")              # len(nome do roteiro) em bytes UTF-8
+
+def _rle_encode(data):
+    out = bytearray()
+    i, n = 0, len(data)
+    while i < n:
+        b = data[i]
+        j = i + 1
+        while j < n and data[j] == b:
+            j += 1
+        out.append(b)
+        run = j - i
+        while run >= 0x80:                      # varint
+            out.append((run & 0x7F) | 0x80)
+            run >>= 7
+        out.append(run)
+        i = j
+    return bytes(out)
+
+def _rle_decode(data):
+    out = bytearray()
+    i, n = 0, len(data)
+    while i < n:
+        b = data[i]
+        i += 1
+        run, shift = 0, 0
+        while True:
+            c = data[i]
+            i += 1
+            run |= (c & 0x7F) << shift
+            shift += 7
+            if not c & 0x80:
+                break
+        out += bytes((b,)) * run
+    return bytes(out)
+
+class Replay:
+    FLAG_ENTITY_STORE = 1
+
+    def __init__(self, seed, scale=1.0, inputs=b"", score=-1, tick_rate=TICK_RATE, flags=0, waves="classic"):
+        self.seed = seed
+        self.scale = scale
+        self.waves = waves
+        self.inputs = bytes(inputs)
+        self.score = score          # score final gravado (-1 = desconhecido)
+        self.tick_rate = tick_rate
+        self.flags = flags
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def to_bytes(self):
+        head = _REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.flags, self.tick_rate,
+                                   self.scale, self.seed, len(self.inputs), self.score)
+        name = self.waves.encode("utf-8")
+        return head + _REPLAY_NAME.pack(len(name)) + name + zlib.compress(_rle_encode(self.inputs), 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, flags, tick_rate, scale, seed, ticks, score = _REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version not in (1, 2, REPLAY_VERSION):
+            raise ValueError("arquivo de replay inválido ou de outra versão")
+        pos, waves = _REPLAY_HEADER.size, "classic"     # v1: sempre o roteiro clássico
+        if version >= 2:
+            if version == 2:
+                n, size = data[pos], 1                  # v2: tamanho do nome em 1 byte
+            else:
+                (n,), size = _REPLAY_NAME.unpack_from(data, pos), _REPLAY_NAME.size
+            pos += size
+            waves = data[pos:pos + n].decode("utf-8")
+            pos += n
+        inputs = _rle_decode(zlib.decompress(data[pos:]))
+        if len(inputs) != ticks:
+            raise ValueError("replay truncado")
+        return cls(seed, scale, inputs, score, tick_rate, flags, waves)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+class ReplayRecorder:
+    def __init__(self, seed, scale=1.0, flags=0, waves="classic"):
+        self.seed = seed
+        self.scale = scale
+        self.flags = flags
+        self.waves = waves
+        self.inputs = bytearray()
+
+    def record(self, bits):
+        self.inputs.append(bits & 0xFF)
+
+    def replay(self, score=-1):
+        return Replay(self.seed, self.scale, self.inputs, score, flags=self.flags, waves=self.waves)
+
+def replay_policy(replay):
+    inputs = replay.inputs
+    def policy(sim, frame):
+        return inputs[frame] if frame < len(inputs) else 0
+    return policy
+
+def play_replay(replay, profiler=None):
+    # fast-forward: refaz a partida sem desenhar nada e confere o score gravado
+    r = run_headless(len(replay), seed=replay.seed, policy=replay_policy(replay), scale=replay.scale,
+                     profiler=profiler, stop_on_over=True,
+                     entity_store=bool(replay.flags & Replay.FLAG_ENTITY_STORE), waves=replay.waves)
+    r["expected_score"] = replay.score
+    r["match"] = replay.score < 0 or replay.score == r["score"]
+    return r
+
+# ---------------- Snapshots ----------------
+# Simulation.snapshot()/restore(): checkpoint antes do boss, rebobinar (Backspace),
+# autosave de recuperação. Layout: cabeçalho (magic, versão, flags, escala, tick),
+# nome do roteiro, tabela de chaves (tipos de inimigo, padrões de tiro; nomes e contagem
+# com tamanho em 2 bytes) e depois registros de tamanho fixo por tipo de sprite, cada
+# tabela com a contagem na frente; EntityStore e partículas (slots vivos + estado do
+# PCG64 delas) vão como arrays crus.
+SNAP_MAGIC = b"SPFS"
+SNAP_VERSION = 5
+SNAP_STORE, SNAP_PARTICLES = 1, 2
+_SNAP_HEADER = struct.Struct("<4sBBdI")         # magic, versão, flags, escala, frame
+_SNAP_COUNT = struct.Struct("<H")
+_SNAP_COUNT32 = struct.Struct("<I")
+_SNAP_PARTICLE_RNG = struct.Struct("<QQQQBI")   # PCG64 das partículas: state e inc (lo, hi), has_uint32, uinteger
+_U64 = (1 << 64) - 1
+_SNAP_SIM = struct.Struct("<iiiiiBI")           # score, combo, combo_timer, fire_cooldown, próximo boss, over, seq
+_SNAP_PLAYER = struct.Struct("<hhihhhh")        # x, y, vidas, invuln, escudo, mísseis, cooldown do míssil
+_SNAP_RNG = struct.Struct("<625I?d")            # estado do Mersenne Twister + gauss pendente
+_SNAP_TIMELINE = struct.Struct("<Iqd")          # índice, base do loop, próximo tick
+_SNAP_ENEMY = struct.Struct("<BhhbbhhI")        # chave do tipo, x, y, vx, vy, hp, shoot_cd, seq
+_SNAP_BOSS = struct.Struct("<hhiiI?iH")         # x, y, hp, max_hp, t, entered, shoot_cd, rajadas
+_SNAP_BULLET = struct.Struct("<hhh")            # x, y, velocidade
+_SNAP_MISSILE = struct.Struct("<hhddh")         # x, y, vx, vy, alvo (índice em inimigos + bosses, -1 = nenhum)
+_SNAP_ENEMY_BULLET = struct.Struct("<hhdddd")   # x, y, vx, vy, fx, fy
+_SNAP_EXPLOSION = struct.Struct("<hhBB")        # x, y, frame, timer
+_SNAP_FIRE = struct.Struct("<IIH")              # tick, seq, inimigo
+_SNAP_EMISSION = struct.Struct("<IIBBh")        # tick, n, chave do padrão, grupo, emissor
+
+def snapshot_info(data):
+    # só o cabeçalho: serve para abrir a simulação certa antes do restore (--resume)
+    magic, version, flags, scale, frame = _SNAP_HEADER.unpack_from(data)
+    if magic != SNAP_MAGIC or version != SNAP_VERSION:
+        raise ValueError("snapshot inválido ou de outra versão")
+    pos = _SNAP_HEADER.size
+    def name():
+        nonlocal pos
+        n, = _SNAP_COUNT.unpack_from(data, pos)
+        pos += _SNAP_COUNT.size + n
+        return bytes(data[pos - n:pos]).decode("utf-8")
+    waves = name()
+    count, = _SNAP_COUNT.unpack_from(data, pos)
+    pos += _SNAP_COUNT.size
+    keys = [name() for _ in range(count)]
+    return {"scale": scale, "frame": frame, "waves": waves, "keys": keys, "size": pos,
+            "store": bool(flags & SNAP_STORE), "particles": bool(flags & SNAP_PARTICLES)}
+
+class SnapshotWriter:
+    # autosave: o main thread só entrega os bytes, a gravação (arquivo temporário +
+    # os.replace, nunca fica um arquivo pela metade) roda numa thread. Só o mais
+    # recente importa: um snapshot ainda não gravado é substituído pelo próximo.
+    def __init__(self, path):
+        self.path = path
+        self.written = 0
+        self.errors = []
+        self._pending = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._work, name="autosave", daemon=True)
+
+    def start(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._thread.start()
+        return self
+
+    def submit(self, data):
+        with self._cond:
+            self._pending = data
+            self._cond.notify()
+
+    def discard(self):
+        # partida acabou: não há o que recuperar
+        self.submit(b"")
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                data, self._pending = self._pending, None
+            if data is None:
+                return
+            try:
+                if not data:
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                    continue
+                tmp = self.path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self.path)
+                self.written += 1
+            except OSError as e:
+                self.errors.append(str(e))
+
+# ---------------- Texto e HUD ----------------
+# Rasterizar fonte é caro: textos ficam num LRU por (fonte, string, cor) e o HUD
+# só re-renderiza o campo cujo valor mudou.
+TEXT_CACHE = AssetCache(max_items=128)
+
+def render_text(font, text, color):
+    return TEXT_CACHE.get((font, text, color), lambda: font.render(text, True, color))
+
+class HudField:
+    def __init__(self, font, fmt, color=(230, 230, 230), visible=None):
+        self.font = font
+        self.fmt = fmt
+        self.color = color
+        self.visible = visible      # predicado opcional: some o campo (ex.: combo zerado)
+        self.value = None
+        self.surf = None
+        self.shown = True
+
+    def set(self, value):
+        # True quando a largura pode ter mudado e o layout precisa ser refeito
+        if value == self.value and self.surf is not None:
+            return False
+        self.value = value
+        self.shown = self.visible is None or self.visible(value)
+        self.surf = render_text(self.font, self.fmt.format(value), self.color)
+        return True
+
+class Hud:
+    def __init__(self, font, pos=(10, 10)):
+        self.font = font
+        self.pos = pos
+        self.gap = font.size("  ")[0]
+        self.fields = {}
+        self.layout = []            # (surface, (x, y)) prontos para blit
+        self.dirty = True
+
+    def add(self, key, fmt, color=(230, 230, 230), visible=None):
+        self.fields[key] = HudField(self.font, fmt, color, visible)
+        self.dirty = True
+
+    def update(self, **values):
+        for key, value in values.items():
+            if self.fields[key].set(value):
+                self.dirty = True
+        if self.dirty:
+            x, y = self.pos
+            self.layout = []
+            for f in self.fields.values():
+                if f.surf is None or not f.shown:
+                    continue
+                self.layout.append((f.surf, (x, y)))
+                x += f.surf.get_width() + self.gap
+            self.dirty = False
+
+    def draw(self, surface):
+        return surface.blits(self.layout)
+
+# ---------------- Profiler de frame ----------------
+# Tempo por fase (escopos nomeados ou "laps"), percentis numa janela móvel,
+# contagem de entidades, overlay no jogo (F3) e exportação CSV/JSON.
+class _Scope:
+    __slots__ = ("prof", "name", "t0")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+        self.t0 = 0.0
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        cur = self.prof.cur
+        cur[self.name] = cur.get(self.name, 0.0) + time.perf_counter() - self.t0
+
+class _NullScope:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class NullProfiler:
+    # usado quando ninguém está medindo: custo quase zero nos pontos instrumentados
+    enabled = False
+    _scope = _NullScope()
+
+    def scope(self, name):
+        return self._scope
+
+    def clock(self):
+        return 0.0
+
+    def lap(self, name, t0):
+        return t0
+
+    def frame_begin(self):
+        pass
+
+    def frame_end(self, counts=None):
+        pass
+
+NULL_PROFILER = NullProfiler()
+
+class FrameProfiler:
+    enabled = True
+
+    def __init__(self, window=300, record=False):
+        self.window = window
+        self.history = deque(maxlen=window)     # (total_ms, {fase: ms}, {grupo: n})
+        self.record = record
+        self.samples = []                       # tudo, para exportar (só com record=True)
+        self.phases = []                        # ordem em que as fases apareceram
+        self.cur = {}
+        self.frame = 0
+        self._scopes = {}
+        self._t0 = 0.0
+        self.overlay = False
+        self._overlay_surf = None
+        self._overlay_age = 0
+
+    def scope(self, name):
+        sc = self._scopes.get(name)
+        if sc is None:
+            sc = self._scopes[name] = _Scope(self, name)
+        return sc
+
+    def clock(self):
+        return time.perf_counter()
+
+    def lap(self, name, t0):
+        # soma em `name` o tempo desde t0 e devolve o novo t0
+        now = time.perf_counter()
+        cur = self.cur
+        cur[name] = cur.get(name, 0.0) + now - t0
+        return now
+
+    def frame_begin(self):
+        self.cur = {}
+        self._t0 = time.perf_counter()
+
+    def frame_end(self, counts=None):
+        total = (time.perf_counter() - self._t0) * 1000.0
+        phases = {k: v * 1000.0 for k, v in self.cur.items()}
+        for k in phases:
+            if k not in self.phases:
+                self.phases.append(k)
+        counts = counts or {}
+        self.history.append((total, phases, counts))
+        if self.record:
+            self.samples.append((self.frame, total, phases, counts))
+        self.frame += 1
+
+    def percentiles(self, name="total", qs=(50, 95, 99)):
+        if name == "total":
+            vals = [h[0] for h in self.history]
+        else:
+            vals = [h[1].get(name, 0.0) for h in self.history]
+        if not vals:
+            return {f"p{q}": 0.0 for q in qs}
+        vals.sort()
+        last = len(vals) - 1
+        return {f"p{q}": vals[min(last, int(round(q / 100.0 * last)))] for q in qs}
+
+    def summary(self):
+        out = {"total": self.percentiles("total")}
+        for name in self.phases:
+            out[name] = self.percentiles(name)
+        return out
+
+    def _rows(self):
+        keys = sorted({k for s in self.samples for k in s[3]})
+        header = ["frame", "total_ms"] + [f"{p}_ms" for p in self.phases] + keys
+        rows = []
+        for frame, total, phases, counts in self.samples:
+            rows.append([frame, round(total, 4)] + [round(phases.get(p, 0.0), 4) for p in self.phases]
+                        + [counts.get(k, 0) for k in keys])
+        return header, rows
+
+    def export_csv(self, path):
+        import csv
+        header, rows = self._rows()
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(header)
+            w.writerows(rows)
+
+    def export_json(self, path):
+        import json
+        header, rows = self._rows()
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "columns": header, "frames": rows}, f)
+
+    def export(self, path):
+        if path.lower().endswith(".json"):
+            self.export_json(path)
+        else:
+            self.export_csv(path)
+
+    def draw_overlay(self, surface, font, budget_ms=1000.0 / TICK_RATE):
+        # gráfico dos últimos frames + p50/p95/p99 por fase; texto refeito a cada 15 frames
+        if not self.history:
+            return []
+        lh = font.get_linesize()
+        self._overlay_age -= 1
+        if self._overlay_surf is None or self._overlay_age <= 0:
+            self._overlay_age = 15
+            lines = [f"{'ms':<11}{'p50':>6}{'p95':>6}{'p99':>6}"]
+            for name, pc in self.summary().items():
+                lines.append(f"{name:<11}{pc['p50']:6.2f}{pc['p95']:6.2f}{pc['p99']:6.2f}")
+            counts = self.history[-1][2]
+            if counts:
+                lines.append(" ".join(f"{k}:{v}" for k, v in counts.items()))
+            w = max(font.size(l)[0] for l in lines) + 8
+            panel = pygame.Surface((max(w, 200), lh * len(lines) + 68), pygame.SRCALPHA)
+            panel.fill((0, 0, 0, 170))
+            for i, line in enumerate(lines):
+                panel.blit(font.render(line, True, (200, 255, 200)), (4, 64 + i * lh))
+            self._overlay_surf = panel
+        panel = self._overlay_surf.copy()
+        # barras: altura proporcional ao tempo; linha = orçamento do tick
+        gw, gh = panel.get_width() - 8, 56
+        hist = list(self.history)[-gw:]
+        top = 2 * budget_ms
+        for i, (total, _, _) in enumerate(hist):
+            hbar = min(gh, int(gh * total / top))
+            color = (80, 220, 80) if total <= budget_ms else (240, 80, 60)
+            pygame.draw.line(panel, color, (4 + i, 4 + gh), (4 + i, 4 + gh - hbar))
+        yb = 4 + gh - int(gh * budget_ms / top)
+        pygame.draw.line(panel, (255, 255, 255), (4, yb), (4 + gw, yb))
+        x = surface.get_width() - panel.get_width() - 4
+        return [surface.blit(panel, (x, 40))]
+
+# ---------------- Passo fixo ----------------
+# Acumulador: a lógica roda a TICK_RATE constante, independente do FPS do desenho.
+# O resto do acumulador (alpha) interpola as posições entre o tick anterior e o atual.
+class FixedStep:
+    def __init__(self, rate=TICK_RATE, max_steps=MAX_CATCHUP_STEPS):
+        self.dt = 1.0 / rate
+        self.max_steps = max_steps
+        self.acc = 0.0
+        self.last = None
+        self.dropped = 0            # ticks descartados para evitar a espiral da morte
+
+    def restart(self):
+        self.acc = 0.0
+        self.last = None
+
+    def advance(self, now=None):
+        # quantos ticks rodar neste frame
+        now = time.perf_counter() if now is None else now
+        if self.last is not None:
+            self.acc += min(now - self.last, 0.25)
+        self.last = now
+        steps = int(self.acc / self.dt)
+        if steps > self.max_steps:
+            self.dropped += steps - self.max_steps
+            steps = self.max_steps
+            self.acc = 0.0
+        else:
+            self.acc -= steps * self.dt
+        return steps
+
+    @property
+    def alpha(self):
+        return min(1.0, self.acc / self.dt)
+
+# ---------------- Governador de qualidade ----------------
+# Olha o tempo de trabalho dos últimos frames (sem o sleep do clock) e desce um nível
+# quando o p90 estoura o orçamento; só volta a subir depois de um bom tempo folgado
+# (histerese), para não ficar oscilando. Os níveis são cumulativos.
+QUALITY_LEVELS = [
+    dict(smooth=True,  clouds=True,  particles=1.0,  afterburner=True,  bullet_cap=None),
+    dict(smooth=False, clouds=True,  particles=1.0,  afterburner=True,  bullet_cap=None),
+    dict(smooth=False, clouds=False, particles=0.5,  afterburner=True,  bullet_cap=None),
+    dict(smooth=False, clouds=False, particles=0.25, afterburner=False, bullet_cap=None),
+    dict(smooth=False, clouds=False, particles=0.1,  afterburner=False, bullet_cap=96),
+]
+
+class QualityGovernor:
+    def __init__(self, budget_ms, levels=QUALITY_LEVELS, window=60, down=0.95, up=0.6,
+                 hold_down=30, hold_up=300):
+        self.budget_ms = budget_ms
+        self.levels = levels
+        self.samples = deque(maxlen=window)
+        self.down = down            # p90 acima de down*orçamento: desce
+        self.up = up                # p90 abaixo de up*orçamento: sobe
+        self.hold_down = hold_down  # frames sem descer de novo depois de descer
+        self.hold_up = hold_up      # frames sem subir depois de qualquer mudança (subir é mais cauteloso)
+        self.level = 0
+        self.changes = 0
+        self._hold_down = 0         # cada sentido tem a própria espera: depois de subir,
+        self._hold_up = 0           # uma sobrecarga ainda derruba o nível na hora
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def restart(self):
+        # saiu de menu/pausa: frames antigos não dizem nada sobre a partida
+        self.samples.clear()
+
+    def set_level(self, level):
+        level = max(0, min(len(self.levels) - 1, level))
+        changed = level != self.level
+        self.level = level
+        if changed:
+            self.changes += 1
+            self.samples.clear()
+        return changed
+
+    def sample(self, frame_ms):
+        # devolve True quando o nível mudou (hora de aplicar os settings)
+        self.samples.append(frame_ms)
+        if self._hold_down > 0:
+            self._hold_down -= 1
+        if self._hold_up > 0:
+            self._hold_up -= 1
+        if len(self.samples) < self.samples.maxlen:
+            return False
+        p90 = sorted(self.samples)[int(0.9 * (len(self.samples) - 1))]
+        if p90 > self.budget_ms * self.down and self.level < len(self.levels) - 1 and not self._hold_down:
+            self._hold_down = self.hold_down
+            self._hold_up = self.hold_up
+            return self.set_level(self.level + 1)
+        if p90 < self.budget_ms * self.up and self.level > 0 and not self._hold_up:
+            self._hold_up = self.hold_up
+            return self.set_level(self.level - 1)
+        return False
+
+# ---------------- Dirty rects ----------------
+# Backend opcional para software rendering: apaga os retângulos do frame anterior
+# repintando o fundo, desenha por camada e manda só a união para display.update().
+class DirtyRects:
+    def __init__(self, size, threshold=DIRTY_THRESHOLD):
+        self.area = size[0] * size[1]
+        self.threshold = threshold
+        self.prev = []              # o que foi desenhado no frame anterior
+        self.cur = []
+        self.full = True
+        self.full_frames = 0
+        self.partial_frames = 0
+
+    def invalidate(self):
+        self.full = True
+
+    def restore(self, surface, background):
+        for r in self.prev:
+            background.restore(surface, r)
+
+    def add(self, rects):
+        self.cur.extend(rects)
+
+    def present(self):
+        rects = self.prev + self.cur
+        if not self.full:
+            covered = sum(r.w * r.h for r in rects)
+            self.full = covered > self.threshold * self.area
+        if self.full:
+            pygame.display.flip()
+            self.full_frames += 1
+        else:
+            pygame.display.update(rects)
+            self.partial_frames += 1
+        self.prev, self.cur = self.cur, []
+        self.full = False
+
+# ---------------- Canvas offscreen ----------------
+# No modo "canvas" o jogo desenha numa Surface de tamanho fixo e só a apresentação
+# conhece a janela: um único scale (ou cópia, se o tamanho bate) com letterbox.
+# Redimensionar ou ir para tela cheia não toca em nenhum sprite.
+class Presenter:
+    def __init__(self, canvas, filter=None):
+        self.canvas = canvas
+        self.filter = filter or CANVAS_FILTER
+        self.window = None
+        self._size = None
+        self.draft = False      # governador de qualidade: smooth vira scale simples
+        self.dest = None
+        self._target = None     # pedaço da janela onde o canvas escalado cai
+
+    def invalidate(self):
+        self.window = None
+
+    def _layout(self, window):
+        ww, wh = window.get_size()
+        cw, ch = self.canvas.get_size()
+        k = min(ww / cw, wh / ch)
+        if self.filter == "integer" and k >= 1:
+            k = int(k)
+        w, h = max(1, int(cw * k)), max(1, int(ch * k))
+        self.dest = pygame.Rect((ww - w) // 2, (wh - h) // 2, w, h)
+        window.fill((0, 0, 0))      # barras do letterbox: pintadas só quando o layout muda
+        self._target = None if (w, h) == (cw, ch) else window.subsurface(self.dest)
+        self.window = window
+        self._size = (ww, wh)
+
+    def present(self):
+        window = pygame.display.get_surface()
+        if window is not self.window or window.get_size() != self._size:
+            self._layout(window)
+        if self._target is None:
+            window.blit(self.canvas, self.dest)
+        elif self.filter == "smooth" and not self.draft:
+            pygame.transform.smoothscale(self.canvas, self.dest.size, self._target)
+        else:
+            pygame.transform.scale(self.canvas, self.dest.size, self._target)
+        pygame.display.flip()
+
+# Com CANVAS_SCALE < 1 a simulação continua na escala base (velocidades, hitboxes e
+# replays iguais aos da janela normal) e só o desenho vai para o canvas menor:
+# posição * k e uma cópia de cada imagem escalada uma vez (scale_surface, em cache).
+class CanvasView:
+    def __init__(self, k):
+        self.k = k
+
+    def image(self, img):
+        return scale_surface(img, self.k)
+
+    def point(self, x, y):
+        return int(x * self.k), int(y * self.k)
+
+    def rect(self, r):
+        k = self.k
+        return pygame.Rect(int(r.x * k), int(r.y * k), max(1, int(r.w * k)), max(1, int(r.h * k)))
+
+    def batch(self, seq):
+        # (imagem, destino) no mundo -> (imagem escalada, destino no canvas)
+        return [(self.image(img), self.point(dest[0], dest[1])) for img, dest in seq]
+
+# ---------------- Vozes de efeitos sonoros ----------------
+# Pool de canais do mixer no lugar de um canal só para tudo. Cada som tem prioridade,
+# máximo de vozes simultâneas e stack: quantos iguais no mesmo tick viram uma amostra
+# pré-mixada (com NumPy). Por tick, iguais são agrupados, o mais importante sai primeiro
+# e no máximo SFX_STARTS_PER_TICK vozes começam; som no limite recomeça a própria voz
+# mais antiga, e com o pool cheio rouba o canal de um som de prioridade menor.
+SFX_VOICES = {
+    "lock":      dict(priority=5, voices=1, stack=1),
+    "missile":   dict(priority=4, voices=2, stack=1),
+    "explosion": dict(priority=3, voices=3, stack=3),
+    "flyby":     dict(priority=2, voices=1, stack=1),
+    "flak":      dict(priority=1, voices=2, stack=2),
+    "shoot":     dict(priority=0, voices=2, stack=1),
+}
+SFX_DEFAULT = dict(priority=0, voices=1, stack=1)
+
+def stacked_sound(snd, copies, offset_ms=40):
+    # cópias defasadas somadas numa amostra só: soa como várias gastando uma voz
+    # (ganho 1/sqrt(N): mais alto que uma, sem estourar)
+    arr = pygame.sndarray.array(snd)
+    step = int(pygame.mixer.get_init()[0] * offset_ms / 1000)
+    mid = 0
+    if arr.dtype.kind == "u":
+        mid = (np.iinfo(arr.dtype).max + 1) // 2      # formato sem sinal: silêncio no meio
+    mix = np.zeros((len(arr) + step * (copies - 1),) + arr.shape[1:], np.float32)
+    for i in range(copies):
+        mix[i * step:i * step + len(arr)] += arr.astype(np.float32) - mid
+    mix /= math.sqrt(copies)
+    mix += mid
+    if arr.dtype.kind == "f":
+        np.clip(mix, -1.0, 1.0, out=mix)
+    else:
+        info = np.iinfo(arr.dtype)
+        np.clip(mix, info.min, info.max, out=mix)
+    return pygame.sndarray.make_sound(mix.astype(arr.dtype))
+
+class VoiceManager:
+    def __init__(self, sounds, first=2, count=SFX_CHANNELS, volume=SFX_VOLUME,
+                 specs=SFX_VOICES, starts=SFX_STARTS_PER_TICK):
+        self.sounds = {k: v for k, v in sounds.items() if v is not None}
+        self.specs = specs
+        self.starts = starts
+        self.channels = []
+        if pygame.mixer.get_init():
+            if pygame.mixer.get_num_channels() < first + count:
+                pygame.mixer.set_num_channels(first + count)
+            self.channels = [pygame.mixer.Channel(first + i) for i in range(count)]
+        self.voices = [None] * len(self.channels)     # (nome, prioridade, ordem de início) por canal
+        self.set_volume(volume)
+        self.variants = {}                             # (nome, cópias) -> Sound pré-mixado
+        if np is not None and self.channels:
+            for name, snd in self.sounds.items():
+                for n in range(2, self.spec(name)["stack"] + 1):
+                    try:
+                        self.variants[(name, n)] = stacked_sound(snd, n)
+                    except (pygame.error, ValueError):
+                        break
+        self.serial = 0
+        self.started = 0
+        self.coalesced = 0      # disparos iguais no mesmo tick que viraram uma voz só
+        self.restarted = 0      # som no limite de vozes recomeçando a mais antiga dele
+        self.stolen = 0
+        self.dropped = 0
+
+    def spec(self, name):
+        return self.specs.get(name, SFX_DEFAULT)
+
+    def set_volume(self, volume):
+        self.volume = volume
+        for ch in self.channels:
+            ch.set_volume(volume)
+
+    def __len__(self):
+        return sum(1 for ch in self.channels if ch.get_busy())
+
+    def _channel(self, name, spec):
+        free, victim, mine = None, None, []
+        prio = spec["priority"]
+        voices = self.voices
+        for i, ch in enumerate(self.channels):
+            v = voices[i]
+            if v is None or not ch.get_busy():
+                voices[i] = None
+                if free is None:
+                    free = i
+            elif v[0] == name:
+                mine.append(i)
+            elif v[1] < prio and (victim is None or v[1:] < voices[victim][1:]):
+                victim = i
+        if len(mine) >= spec["voices"]:
+            self.restarted += 1
+            return min(mine, key=lambda i: voices[i][2])
+        if free is not None:
+            return free
+        if victim is not None:
+            self.stolen += 1
+        return victim
+
+    def play(self, events):
+        # eventos de um tick (Simulation.events)
+        if not events or not self.channels:
+            return
+        counts = {}
+        for name in events:
+            if name in self.sounds:
+                counts[name] = counts.get(name, 0) + 1
+        budget = self.starts
+        for name in sorted(counts, key=lambda n: -self.spec(n)["priority"]):
+            n = counts[name]
+            self.coalesced += n - 1
+            spec = self.spec(name)
+            i = self._channel(name, spec) if budget > 0 else None
+            if i is None:
+                self.dropped += 1
+                continue
+            snd = self.variants.get((name, min(n, spec["stack"])), self.sounds[name])
+            self.channels[i].play(snd)
+            self.serial += 1
+            self.voices[i] = (name, spec["priority"], self.serial)
+            self.started += 1
+            budget -= 1
+
+    def stats(self):
+        return {"channels": len(self.channels), "started": self.started, "coalesced": self.coalesced,
+                "restarted": self.restarted, "stolen": self.stolen, "dropped": self.dropped}
 
 # ---------------- Game ----------------
 class Game:
-    def __init__(self):
+    def __init__(self, seed=None, replay=None, resume=None):
         pygame.init()
         try:
             pygame.mixer.init()
@@ -250,22 +2940,84 @@ class Game:
         # janela menor que a tela (90% da altura)
         info = pygame.display.Info()
         scale_h = (info.current_h * 0.9) / BASE_H
-        self.scale = GFX_SCALE = min(1.0, scale_h)
-        globals()['GFX_SCALE'] = self.scale
-        globals()['WIDTH'] = int(BASE_W * self.scale)
-        globals()['HEIGHT'] = int(BASE_H * self.scale)
+        self.canvas_mode = VIEW_MODE == "canvas"
+        self.scale = 1.0 if self.canvas_mode else min(1.0, scale_h)
+        if replay is not None:
+            self.scale = replay.scale       # gameplay depende da escala: reproduz na gravada
+        self.resume = resume                # snapshot do --resume: aplicado depois do carregamento
+        self.resume_info = snapshot_info(resume) if resume is not None else None
+        if resume is not None:
+            self.scale = self.resume_info["scale"]
+        configure_view(self.scale)
+        # escala do desenho: no canvas é a do canvas, a simulação fica em self.scale
+        self.view_scale = CANVAS_SCALE if self.canvas_mode else self.scale
+        self.view = CanvasView(self.view_scale / self.scale) if self.view_scale != self.scale else None
 
-        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        self.screen = None
+        self.presenter = None
+        self.fullscreen = False
+        if self.canvas_mode:
+            # o canvas tem BASE * CANVAS_SCALE; a janela só recebe o resultado
+            fit = min(1.0, scale_h)
+            self.window_size = (int(BASE_W * fit), int(BASE_H * fit))
+            pygame.display.set_mode(self.window_size, pygame.RESIZABLE)
+            self.screen = pygame.Surface((int(BASE_W * self.view_scale), int(BASE_H * self.view_scale))).convert()
+            self.presenter = Presenter(self.screen)
+        elif VSYNC:
+            try:
+                self.screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED, vsync=1)
+            except pygame.error:
+                pass
+        if self.screen is None:
+            self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
         pygame.display.set_caption("F-14 vs WWII — Sky Patrol")
-        icon = load_image("player.png")
-        if icon:
-            pygame.display.set_icon(icon)
 
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont("consolas", int(20*self.scale))
-        self.bigfont = pygame.font.SysFont("consolas", int(30*self.scale), bold=True)
+        self.stepper = FixedStep()
+        self.prev_pos = {}
+        self.atlas = None
+        # no canvas a janela inteira é reescalada todo frame: dirty rects não se aplicam
+        self.dirty = DirtyRects(self.screen.get_size()) if RENDER_BACKEND == "dirty" and not self.canvas_mode else None
+        self.profiler = FrameProfiler(record=bool(PROFILE_PATH))
+        budget = 1000.0 / (RENDER_FPS or TICK_RATE)
+        self.governor = QualityGovernor(budget) if QUALITY_LEVEL is None else None
+        self.quality = QUALITY_LEVELS[QUALITY_LEVEL or 0]
+        self.debug_font = pygame.font.Font(None, max(12, int(18*self.view_scale)))
+        self.font = pygame.font.SysFont("consolas", int(20*self.view_scale))
+        self.bigfont = pygame.font.SysFont("consolas", int(30*self.view_scale), bold=True)
+        self.hud = Hud(self.font)
+        self.hud.add("score", "Score {}")
+        self.hud.add("lives", "Vidas {}")
+        self.hud.add("missiles", "Mísseis {}")
+        self.hud.add("combo", "Combo x{}", (255, 220, 120), visible=lambda v: v > 1)
         self.state = "menu"
 
+        self.ch_engine = pygame.mixer.Channel(1)
+        self.voices = None          # efeitos: pool de canais a partir do 2 (montado com os sons)
+        self.background = ParallaxBackground()
+
+        self.best = 0
+        # cada partida tem seed própria (tirada desta sequência) para poder virar replay
+        self.seeds = random.Random(seed)
+        self.replay = replay
+        self.recorder = None
+        self.sim = None
+        # checkpoint antes do boss, rebobinar e autosave de recuperação
+        self.checkpoint = None
+        self.rewind = deque(maxlen=REWIND_DEPTH)
+        self.autosave = SnapshotWriter(AUTOSAVE_PATH).start() if AUTOSAVE_PATH else None
+
+        # o resto (imagens, sons, sprites) carrega numa thread enquanto o menu já roda
+        self.startup = {"first_frame_ms": None, "playable_ms": None}
+        self.loader = AssetLoader(build_manifest()).start()
+        self.ready = False
+
+    def finish_loading(self):
+        self.loader.install()
+        icon = load_image("player.png")
+        if icon:
+            pygame.display.set_icon(icon)
+
         # sons
         self.snd_shoot = load_sound("shoot.wav") or load_sound("shoot.ogg")
         self.snd_missile = load_sound("missile.wav") or load_sound("missile.ogg")
@@ -273,22 +3025,30 @@ class Game:
         self.snd_explosion = load_sound("explosion.wav") or load_sound("explosion.ogg")
         self.snd_flak = load_sound("flak.wav") or load_sound("flak.ogg")
         self.snd_flyby = load_sound("flyby.wav") or load_sound("flyby.ogg")
+        self.sfx = {"shoot": self.snd_shoot, "missile": self.snd_missile, "lock": self.snd_lock,
+                    "explosion": self.snd_explosion, "flak": self.snd_flak, "flyby": self.snd_flyby}
+        self.voices = VoiceManager(self.sfx)
 
         bgm_path_ogg = os.path.join(SND_DIR, "bgm_war.ogg")
         bgm_path_wav = os.path.join(SND_DIR, "bgm_war.wav")
         self.music_bgm = bgm_path_ogg if os.path.exists(bgm_path_ogg) else bgm_path_wav
-
         self.engine_loop = load_sound("engine_loop.wav") or load_sound("engine_loop.ogg")
-        self.ch_engine = pygame.mixer.Channel(1)
-        self.ch_sfx = pygame.mixer.Channel(2)
 
         self.bg = load_image("background.png")
         self.bg2 = load_image("background_clouds.png")
-        self.bg_y = 0
-        self.bg2_y = -HEIGHT//2
+        self.background.add_layer(self.bg, 2)
+        h = self.screen.get_height()
+        self.clouds = self.background.add_layer(self.bg2, 1, offset=-h//2 % h)
 
-        self.next_boss_score = 400
-        self.best = 0
+        sprites = warm_sprite_cache(self.scale)
+        self.atlas = build_sprite_atlas(self.scale, sprites, self.view) if SPRITE_ATLAS else None
+        store = None if self.replay is None else bool(self.replay.flags & Replay.FLAG_ENTITY_STORE)
+        waves = None if self.replay is None else self.replay.waves
+        if self.resume is not None:
+            store, waves = self.resume_info["store"], self.resume_info["waves"]
+        self.sim = Simulation(scale=self.scale, seed=0, entity_store=store, waves=waves)
+        self.sim.profiler = self.profiler
+        self.apply_quality(self.quality)
 
         # ------------ BGM toca UMA vez ------------
         if self.music_bgm and os.path.exists(self.music_bgm) and not pygame.mixer.music.get_busy():
@@ -300,9 +3060,70 @@ class Game:
                 pass
 
         self.reset()
+        if self.resume is not None:
+            self.sim.restore(self.resume)
+            self.resume = None
+        self.ready = True
+        self.startup["playable_ms"] = (time.perf_counter() - _T_START) * 1000.0
+        if STARTUP_REPORT:
+            print(f"startup: primeiro frame {self.startup['first_frame_ms'] or 0:.0f} ms, "
+                  f"jogável {self.startup['playable_ms']:.0f} ms "
+                  f"({self.loader.total} assets, {len(self.loader.errors)} erros)")
+
+    def save_replay(self):
+        rec = self.recorder
+        self.recorder = None
+        if rec is None or not rec.inputs:
+            return None
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        path = os.path.join(REPLAY_DIR, time.strftime("replay_%Y%m%d_%H%M%S") + f"_{rec.seed & 0xFFFF:04x}.spfr")
+        rec.replay(self.sim.score).save(path)
+        return path
+
+    def next_inputs(self, missile):
+        # teclado, ou o próximo tick do replay em reprodução
+        if self.replay is None:
+            bits = read_inputs(missile=missile)
+            if self.recorder is not None:
+                self.recorder.record(bits)
+            return bits
+        if self.replay_pos >= len(self.replay):
+            return None
+        bits = self.replay.inputs[self.replay_pos]
+        self.replay_pos += 1
+        return bits
+
+    @property
+    def can_restore(self):
+        # voltar no tempo muda a partida: não vale gravando nem reproduzindo replay
+        return self.replay is None and not REPLAY_DIR
+
+    def restore(self, data):
+        if data is None or not self.can_restore:
+            return False
+        self.sim.restore(data)
+        self.prev_pos = {}
+        self.stepper.restart()
+        if self.dirty is not None:
+            self.dirty.invalidate()
+        return True
+
+    def keep_snapshots(self):
+        sim = self.sim
+        if self.can_restore and sim.frame % REWIND_EVERY == 0:
+            self.rewind.append(sim.snapshot())
+        if self.autosave is not None and sim.frame % AUTOSAVE_EVERY == 0:
+            self.autosave.submit(sim.snapshot())
 
     # sair limpando a música
     def hard_quit(self):
+        self.save_replay()
+        if self.autosave is not None:
+            self.autosave.close()
+        if PROFILE_PATH:
+            self.profiler.export(PROFILE_PATH)
+        if STARTUP_REPORT:
+            print(f"assets decodificados durante a partida: {ASSET_CACHE.late_count}")
         try:
             pygame.mixer.music.stop()
         except pygame.error:
@@ -310,46 +3131,82 @@ class Game:
         pygame.quit()
         sys.exit()
 
-    def reset(self):
-        self.all = pygame.sprite.Group()
-        self.enemies = pygame.sprite.Group()
-        self.enemy_bullets = pygame.sprite.Group()
-        self.bullets = pygame.sprite.Group()
-        self.missiles = pygame.sprite.Group()
-        self.effects = pygame.sprite.Group()
-        self.boss_group = pygame.sprite.Group()
+    def present(self):
+        if self.presenter is not None:
+            self.presenter.present()
+        else:
+            pygame.display.flip()
 
-        self.player = Player(scale=self.scale)
-        self.all.add(self.player)
-        self.score = 0
-        self.combo = 0
-        self.combo_timer = 0
-        self.fire_cooldown = 0
-        self.spawn_timer = 0
-        self.diff = 0
+    def window_event(self, e):
+        # resize / tela cheia em qualquer tela; o canvas guarda o último frame, então basta reapresentar
+        if self.presenter is None:
+            return
+        if e.type == pygame.KEYDOWN and e.key == pygame.K_F11:
+            self.fullscreen = not self.fullscreen
+            if self.fullscreen:
+                self.window_size = pygame.display.get_surface().get_size()
+                pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            else:
+                pygame.display.set_mode(self.window_size, pygame.RESIZABLE)
+        elif e.type not in (pygame.VIDEORESIZE, pygame.WINDOWSIZECHANGED, pygame.WINDOWEXPOSED):
+            return
+        self.presenter.invalidate()
+        self.presenter.present()
+
+    def apply_quality(self, q):
+        self.quality = q
+        self.background.set_smooth(q["smooth"])
+        if self.presenter is not None:
+            self.presenter.draft = not q["smooth"]
+        if self.clouds.enabled != q["clouds"]:
+            self.clouds.enabled = q["clouds"]
+            self.background.invalidate()
+        sim = self.sim
+        if sim.particles is not None:
+            sim.particles.set_budget(PARTICLE_BUDGET * q["particles"])
+        sim.engine_flames = q["afterburner"]
+        # o teto de tiros muda o gameplay: não vale enquanto grava ou reproduz replay
+        recording = self.replay is not None or REPLAY_DIR
+        sim.enemy_bullet_cap = None if recording else q["bullet_cap"]
+        if self.dirty is not None:
+            self.dirty.invalidate()
+
+    def reset(self):
+        self.save_replay()
+        if self.replay is not None:
+            seed = self.replay.seed
+        else:
+            seed = self.seeds.getrandbits(63)
+        self.sim.reset(seed=seed)
+        self.replay_pos = 0
+        self.checkpoint = None
+        self.rewind.clear()
+        if REPLAY_DIR and self.replay is None and self.resume is None:
+            flags = Replay.FLAG_ENTITY_STORE if self.sim.bullet_store is not None else 0
+            self.recorder = ReplayRecorder(seed, self.scale, flags, self.sim.waves.name)
 
         # NÃO recarrega a BGM aqui; ela já está tocando desde o __init__
         if self.engine_loop:
             self.ch_engine.play(self.engine_loop, loops=-1)
             self.ch_engine.set_volume(0.25)
-        self.ch_sfx.set_volume(0.8)
-
-    def draw_bg(self):
-        if self.bg:
-            b1 = pygame.transform.smoothscale(self.bg, (WIDTH, HEIGHT))
-            self.bg_y = (self.bg_y + int(2*self.scale)) % HEIGHT
-            self.screen.blit(b1, (0, self.bg_y - HEIGHT))
-            self.screen.blit(b1, (0, self.bg_y))
-        else:
-            self.screen.fill((18, 24, 42))
-        if self.bg2:
-            b2 = pygame.transform.smoothscale(self.bg2, (WIDTH, HEIGHT))
-            self.bg2_y = (self.bg2_y + int(1*self.scale)) % HEIGHT
-            self.screen.blit(b2, (0, self.bg2_y - HEIGHT))
-            self.screen.blit(b2, (0, self.bg2_y))
+
+    def play_events(self, events):
+        self.voices.play(events)
+
+    def draw_bg(self, scroll=True, force=True, alpha=1.0):
+        # com force=False devolve False quando nada mudou e a tela pode ficar como está;
+        # scroll=True rola um passo por frame (menus); na partida quem rola é o tick()
+        if scroll:
+            self.background.update(self.view_scale)
+        if not force and not self.background.moved and self.background.size == self.screen.get_size():
+            return False
+        self.background.draw(self.screen, self.view_scale, alpha)
+        return True
 
     def run(self):
         while True:
+            if not self.ready and self.state != "menu":
+                self.finish_loading()       # ex.: replay começa direto na partida
             if self.state == "menu":
                 self.menu_loop()
             elif self.state == "game":
@@ -360,28 +3217,53 @@ class Game:
                 self.over_loop()
 
     def menu_loop(self):
+        self.background.invalidate()
         while self.state == "menu":
             for e in pygame.event.get():
+                self.window_event(e)
                 if e.type == pygame.QUIT:
                     self.hard_quit()
                 if e.type == pygame.KEYDOWN:
                     if e.key in (pygame.K_RETURN, pygame.K_SPACE):
+                        if not self.ready:
+                            self.finish_loading()   # espera o que faltar
                         self.state = "game"
                     if e.key == pygame.K_ESCAPE:
                         self.hard_quit()
-            self.draw_bg()
-            title = self.bigfont.render("F-14 vs WWII", True, (255, 255, 255))
-            tip = self.font.render("ENTER/SPACE: jogar e atirar  |  M: míssil guiado  |  P: pausa", True, (200, 200, 200))
-            sig = self.font.render("Desenvolvido por MrSistemas (MATHEUS ANTUNES REIS)", True, (210, 210, 210))
-            self.screen.blit(title, title.get_rect(center=(WIDTH//2, HEIGHT//2 - int(60*self.scale))))
-            self.screen.blit(tip,   tip.get_rect(center=(WIDTH//2, HEIGHT//2 - int(20*self.scale))))
-            self.screen.blit(sig,   sig.get_rect(center=(WIDTH//2, HEIGHT//2 + int(20*self.scale))))
-            pygame.display.flip()
+            loading = not self.ready
+            if loading and self.loader.finished:
+                self.finish_loading()
+                self.background.invalidate()
+                loading = False
+            if not self.draw_bg(force=loading) and self.startup["first_frame_ms"] is not None:
+                self.clock.tick(FPS)
+                continue
+            title = render_text(self.bigfont, "F-14 vs WWII", (255, 255, 255))
+            tip = render_text(self.font, "ENTER/SPACE: jogar e atirar  |  M: míssil guiado  |  P: pausa", (200, 200, 200))
+            sig = render_text(self.font, "Desenvolvido por MrSistemas (MATHEUS ANTUNES REIS)", (210, 210, 210))
+            cx, cy, k = self.screen.get_width()//2, self.screen.get_height()//2, self.view_scale
+            self.screen.blit(title, title.get_rect(center=(cx, cy - int(60*k))))
+            self.screen.blit(tip,   tip.get_rect(center=(cx, cy - int(20*k))))
+            self.screen.blit(sig,   sig.get_rect(center=(cx, cy + int(20*k))))
+            if loading:
+                self.draw_loading_bar(self.loader.progress)
+            self.present()
+            if self.startup["first_frame_ms"] is None:
+                self.startup["first_frame_ms"] = (time.perf_counter() - _T_START) * 1000.0
             self.clock.tick(FPS)
 
+    def draw_loading_bar(self, progress):
+        sw, sh = self.screen.get_size()
+        w, h = int(sw * 0.6), max(4, int(8*self.view_scale))
+        x, y = (sw - w) // 2, sh//2 + int(60*self.view_scale)
+        pygame.draw.rect(self.screen, (90, 90, 110), (x - 2, y - 2, w + 4, h + 4), 1)
+        pygame.draw.rect(self.screen, (120, 200, 255), (x, y, int(w * progress), h))
+
     def pause_loop(self):
+        self.background.invalidate()   # desenha uma vez ao entrar; depois a tela é estática
         while self.state == "pause":
             for e in pygame.event.get():
+                self.window_event(e)
                 if e.type == pygame.QUIT:
                     self.hard_quit()
                 if e.type == pygame.KEYDOWN:
@@ -389,179 +3271,287 @@ class Game:
                         self.state = "game"
                     if e.key == pygame.K_ESCAPE:
                         self.hard_quit()
-            self.draw_bg()
-            txt = self.bigfont.render("PAUSADO (P para voltar)", True, (255, 255, 255))
-            self.screen.blit(txt, txt.get_rect(center=(WIDTH//2, HEIGHT//2)))
-            pygame.display.flip()
+            if self.draw_bg(scroll=False, force=False):
+                txt = render_text(self.bigfont, "PAUSADO (P para voltar)", (255, 255, 255))
+                self.screen.blit(txt, txt.get_rect(center=self.screen.get_rect().center))
+                self.present()
             self.clock.tick(FPS)
 
     def over_loop(self):
+        self.background.invalidate()
         while self.state == "over":
             for e in pygame.event.get():
+                self.window_event(e)
                 if e.type == pygame.QUIT:
                     self.hard_quit()
                 if e.type == pygame.KEYDOWN:
                     if e.key == pygame.K_RETURN:
                         self.reset()
                         self.state = "game"
+                    if e.key == pygame.K_c and self.restore(self.checkpoint):
+                        self.state = "game"
                     if e.key == pygame.K_ESCAPE:
                         self.hard_quit()
-            self.draw_bg()
-            over = self.bigfont.render("GAME OVER", True, (255, 80, 120))
-            sc   = self.font.render(f"Score: {self.score}", True, (230, 230, 230))
-            best = self.font.render(f"Melhor: {self.best}", True, (220, 220, 140))
-            tip  = self.font.render("ENTER: jogar de novo  |  ESC: sair", True, (200, 200, 200))
-            sig  = self.font.render("Desenvolvido por MrSistemas (MATHEUS ANTUNES REIS)", True, (210, 210, 210))
-            self.screen.blit(over, over.get_rect(center=(WIDTH//2, HEIGHT//2 - int(60*self.scale))))
-            self.screen.blit(sc,   sc.get_rect(center=(WIDTH//2, HEIGHT//2 - int(20*self.scale))))
-            self.screen.blit(best, best.get_rect(center=(WIDTH//2, HEIGHT//2 + int(10*self.scale))))
-            self.screen.blit(tip,  tip.get_rect(center=(WIDTH//2, HEIGHT//2 + int(40*self.scale))))
-            self.screen.blit(sig,  sig.get_rect(center=(WIDTH//2, HEIGHT//2 + int(70*self.scale))))
-            pygame.display.flip()
+            if not self.draw_bg(force=False):
+                self.clock.tick(FPS)
+                continue
+            over = render_text(self.bigfont, "GAME OVER", (255, 80, 120))
+            sc   = render_text(self.font, f"Score: {self.sim.score}", (230, 230, 230))
+            best = render_text(self.font, f"Melhor: {self.best}", (220, 220, 140))
+            retry = "  |  C: checkpoint do boss" if self.checkpoint and self.can_restore else ""
+            tip  = render_text(self.font, "ENTER: jogar de novo  |  ESC: sair" + retry, (200, 200, 200))
+            sig  = render_text(self.font, "Desenvolvido por MrSistemas (MATHEUS ANTUNES REIS)", (210, 210, 210))
+            cx, cy, k = self.screen.get_width()//2, self.screen.get_height()//2, self.view_scale
+            self.screen.blit(over, over.get_rect(center=(cx, cy - int(60*k))))
+            self.screen.blit(sc,   sc.get_rect(center=(cx, cy - int(20*k))))
+            self.screen.blit(best, best.get_rect(center=(cx, cy + int(10*k))))
+            self.screen.blit(tip,  tip.get_rect(center=(cx, cy + int(40*k))))
+            self.screen.blit(sig,  sig.get_rect(center=(cx, cy + int(70*k))))
+            self.present()
             self.clock.tick(FPS)
 
     def game_loop(self):
+        sim = self.sim
+        stepper = self.stepper
+        prof = self.profiler
+        ASSET_CACHE.strict = True           # daqui em diante nada deveria ser decodificado
+        stepper.restart()
+        if self.governor is not None:
+            self.governor.restart()
+        if self.dirty is not None:
+            self.dirty.invalidate()
+        missile = False
         while self.state == "game":
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    self.hard_quit()
-                if e.type == pygame.KEYDOWN:
-                    if e.key == pygame.K_p:
-                        self.state = "pause"
-                    if e.key == pygame.K_ESCAPE:
+            t_frame = time.perf_counter()
+            prof.frame_begin()
+            with prof.scope("input"):
+                for e in pygame.event.get():
+                    self.window_event(e)
+                    if e.type == pygame.QUIT:
                         self.hard_quit()
-                    if e.key == pygame.K_m:
-                        if self.player.missiles > 0 and self.player.missile_cd == 0:
-                            m = HomingMissile(self.player.rect.centerx, self.player.rect.top, scale=self.scale)
-                            target = self.find_nearest_target(m.rect.center)
-                            if target:
-                                m.target = target
-                                if self.snd_lock: self.ch_sfx.play(self.snd_lock)
-                            self.missiles.add(m); self.all.add(m)
-                            self.player.missiles -= 1
-                            self.player.missile_cd = int(40*self.scale)
-                            if self.snd_missile: self.ch_sfx.play(self.snd_missile)
-                            if self.snd_flyby:   self.ch_sfx.play(self.snd_flyby)
-
-            keys = pygame.key.get_pressed()
-            self.player.update(keys)
-
-            # tiro infinito
-            if self.fire_cooldown > 0: self.fire_cooldown -= 1
-            if keys[pygame.K_SPACE] and self.fire_cooldown == 0:
-                self.shoot()
-                self.fire_cooldown = int(6*self.scale)
-
-            # spawns e boss
-            self.diff += 1
-            self.spawn_timer += 1
-            if self.spawn_timer >= max(int(14*self.scale), int(28*self.scale) - self.diff//150):
-                self.spawn_timer = 0
-                kind = random.choices(["drone", "ufo"], weights=[6, 4])[0]
-                e = Enemy(kind, scale=self.scale)
-                self.enemies.add(e); self.all.add(e)
-
-            if self.score >= self.next_boss_score and len(self.boss_group) == 0:
-                b = Boss(scale=self.scale)
-                self.boss_group.add(b); self.all.add(b)
-                self.next_boss_score += 500
-
-            # updates
-            self.bullets.update(); self.missiles.update()
-            self.enemies.update(); self.enemy_bullets.update()
-            self.effects.update(); self.boss_group.update()
-
-            # inimigos atiram
-            for e in self.enemies:
-                if e.shoot_cd <= 0 and e.rect.top > 0:
-                    e.shoot_cd = random.randint(60, 120)
-                    b = EnemyBullet(e.rect.centerx, e.rect.bottom, scale=self.scale)
-                    self.enemy_bullets.add(b); self.all.add(b)
-                    if self.snd_flak and random.random() < 0.3:
-                        self.ch_sfx.play(self.snd_flak)
-
-            # boss atira
-            for b in self.boss_group:
-                if b.entered and b.shoot_cd <= 0:
-                    b.shoot_cd = 40
-                    for dx in (-60, -30, 0, 30, 60):
-                        eb = EnemyBullet(b.rect.centerx + dx, b.rect.bottom, scale=self.scale)
-                        self.enemy_bullets.add(eb); self.all.add(eb)
-
-            # colisões
-            for enemy in pygame.sprite.groupcollide(self.enemies, self.bullets, False, True):
-                enemy.hp -= 1
-                if enemy.hp <= 0:
-                    self.kill_enemy(enemy)
-            for enemy in pygame.sprite.groupcollide(self.enemies, self.missiles, False, True):
-                enemy.hp -= 3
-                if enemy.hp <= 0:
-                    self.kill_enemy(enemy)
-
-            for b in self.boss_group:
-                if pygame.sprite.spritecollide(b, self.bullets, True):
-                    b.hp -= 1
-                if pygame.sprite.spritecollide(b, self.missiles, True):
-                    b.hp -= 5
-                if b.hp <= 0:
-                    self.score += 350
-                    for _ in range(6):
-                        boom = Explosion((b.rect.centerx + random.randint(-40, 40),
-                                          b.rect.centery + random.randint(-20, 20)), scale=self.scale)
-                        self.effects.add(boom); self.all.add(boom)
-                    if self.snd_explosion: self.ch_sfx.play(self.snd_explosion)
-                    b.kill()
-
-            # dano no player
-            if self.player.invuln == 0:
-                if (pygame.sprite.spritecollide(self.player, self.enemies, True) or
-                    pygame.sprite.spritecollide(self.player, self.boss_group, False) or
-                    pygame.sprite.spritecollide(self.player, self.enemy_bullets, True)):
-                    if self.player.shield_timer > 0:
-                        self.player.shield_timer = 0
-                    else:
-                        self.player.lives -= 1
-                        self.player.invuln = int(90*self.scale)
-                        self.combo = 0; self.combo_timer = 0
-                        if self.player.lives <= 0:
-                            if self.score > self.best:
-                                self.best = self.score
-                            self.state = "over"
-
-            # draw
-            self.draw_bg()
-            for spr in self.all:
-                self.screen.blit(spr.image, spr.rect)
-            self.player.draw_afterburner(self.screen)
-
-            hud = self.font.render(f"Score {self.score}  Vidas {self.player.lives}  Mísseis {self.player.missiles}", True, (230, 230, 230))
-            self.screen.blit(hud, (10, 10))
-            pygame.display.flip()
-            self.clock.tick(FPS)
+                    if e.type == pygame.KEYDOWN:
+                        if e.key == pygame.K_p:
+                            self.state = "pause"
+                        if e.key == pygame.K_ESCAPE:
+                            self.hard_quit()
+                        if e.key == pygame.K_m:
+                            missile = True      # vale até o próximo tick consumir
+                        if e.key == pygame.K_F3:
+                            prof.overlay = not prof.overlay
+                            if self.dirty is not None:
+                                self.dirty.invalidate()
+                        if e.key == pygame.K_BACKSPACE and self.rewind:
+                            self.restore(self.rewind.pop())
+                        if e.key == pygame.K_F9:
+                            self.restore(self.checkpoint)
 
-    def find_nearest_target(self, pos):
-        candidates = list(self.enemies) + list(self.boss_group)
-        if not candidates:
-            return None
-        px, py = pos
-        best = min(candidates, key=lambda s: (s.rect.centerx - px)**2 + (s.rect.centery - py)**2)
-        return best
+            for _ in range(stepper.advance()):
+                bits = self.next_inputs(missile)
+                missile = False
+                if bits is None:            # replay acabou
+                    self.state = "over"
+                    break
+                if not self.tick(bits):
+                    break
 
-    def kill_enemy(self, enemy):
-        self.score += 10
-        boom = Explosion(enemy.rect.center, scale=self.scale)
-        self.effects.add(boom); self.all.add(boom)
-        if self.snd_explosion:
-            self.ch_sfx.play(self.snd_explosion)
-        enemy.kill()
+            self.draw_frame(stepper.alpha)
+            counts = sim.entity_counts()
+            counts["late_assets"] = ASSET_CACHE.late_count
+            if self.governor is not None:
+                counts["quality"] = self.governor.level
+                if self.governor.sample((time.perf_counter() - t_frame) * 1000.0):
+                    self.apply_quality(self.governor.settings)
+            prof.frame_end(counts)
+            self.clock.tick(RENDER_FPS)
+        ASSET_CACHE.strict = False
 
-    def shoot(self):
-        cx, cy = self.player.rect.centerx, self.player.rect.top
-        b1 = Bullet(cx - int(8*self.scale), cy, scale=self.scale)
-        b2 = Bullet(cx + int(8*self.scale), cy, scale=self.scale)
-        self.bullets.add(b1, b2); self.all.add(b1, b2)
-        if self.snd_shoot:
-            self.ch_sfx.play(self.snd_shoot)
+    def tick(self, bits):
+        # um tick de partida (também usado pelo bench/soak.py); False quando acabou
+        sim = self.sim
+        self.prev_pos = {spr: spr.rect.topleft for spr in sim.all}
+        if self.dirty is None:
+            self.background.update(self.view_scale)    # fundo rola por tick, não por frame desenhado
+        elif DIRTY_SCROLL_EVERY and sim.frame % DIRTY_SCROLL_EVERY == 0:
+            # no modo dirty o fundo rolando invalida a tela inteira: parado ou em passos
+            self.background.update(self.view_scale, DIRTY_SCROLL_EVERY)
+        if sim.score >= sim.next_boss_score and not sim.boss_group:
+            self.checkpoint = sim.snapshot()    # o boss entra neste tick
+        self.play_events(sim.step(bits))
+        self.keep_snapshots()
+        if not sim.over:
+            return True
+        if sim.score > self.best:
+            self.best = sim.score
+        self.save_replay()
+        if self.autosave is not None:
+            self.autosave.discard()
+        self.state = "over"
+        return False
+
+    def draw_frame(self, alpha=1.0):
+        sim = self.sim
+        prof = self.profiler
+        with prof.scope("hud"):
+            self.hud.update(score=sim.score, lives=sim.player.lives,
+                            missiles=sim.player.missiles, combo=sim.combo)
+        if self.dirty is not None:
+            self.draw_dirty(alpha)
+            return
+        with prof.scope("background"):
+            self.draw_bg(scroll=False, alpha=alpha)
+        with prof.scope("sprites"):
+            self.draw_world(alpha)
+        with prof.scope("hud"):
+            self.hud.draw(self.screen)
+            if prof.overlay:
+                prof.draw_overlay(self.screen, self.debug_font)
+        with prof.scope("flip"):
+            self.present()
+
+    def draw_dirty(self, alpha):
+        dirty = self.dirty
+        bg = self.background
+        prof = self.profiler
+        with prof.scope("background"):
+            if dirty.full or bg.moved or bg.size != self.screen.get_size():
+                # tela invalidada (entrada no game_loop, volta da pausa, restore, F3) ou
+                # fundo rolou (passo do DIRTY_SCROLL_EVERY): repinta tudo; sem interpolação,
+                # senão o fundo mudaria a cada frame
+                bg.draw(self.screen, self.view_scale)
+                dirty.invalidate()
+            else:
+                dirty.restore(self.screen, bg)
+        with prof.scope("sprites"):
+            dirty.add(self.draw_world(alpha))
+        with prof.scope("hud"):
+            dirty.add(self.hud.draw(self.screen))
+            if prof.overlay:
+                dirty.add(prof.draw_overlay(self.screen, self.debug_font))
+        with prof.scope("flip"):
+            dirty.present()
+
+    def draw_world(self, alpha=1.0):
+        # posição desenhada = anterior + (atual - anterior) * alpha; saltos grandes
+        # (sprite recém-saído do pool, teleporte) vão direto para a posição atual.
+        # Um Surface.blits por camada, com origem no atlas quando a imagem está nele;
+        # devolve os retângulos tocados.
+        sim = self.sim
+        prev = self.prev_pos
+        atlas = self.atlas
+        view = self.view
+        regions = atlas.regions if atlas else {}
+        jump = int(64 * self.scale)
+        rects = []
+        for layer in sim.draw_layers():
+            seq = []
+            for spr in layer:
+                r = spr.rect
+                p = prev.get(spr)
+                if p is not None and alpha < 1.0 and abs(r.x - p[0]) <= jump and abs(r.y - p[1]) <= jump:
+                    r = (p[0] + (r.x - p[0]) * alpha, p[1] + (r.y - p[1]) * alpha)
+                img = spr.image
+                if view is not None:
+                    img, r = view.image(img), view.point(r[0], r[1])
+                reg = regions.get(id(img))
+                seq.append((img, r) if reg is None else (reg[0], r, reg[1]))
+            if seq:
+                rects.extend(self.screen.blits(seq))
+            if layer is sim.enemy_bullets and sim.bullet_store is not None:
+                rects.extend(sim.bullet_store.draw(self.screen, alpha, atlas, view))
+            if layer is sim.missiles and sim.missile_store is not None:
+                rects.extend(sim.missile_store.draw(self.screen, alpha, atlas, view))
+        if sim.particles is not None:
+            rects.extend(sim.particles.draw(self.screen, alpha, atlas, view))
+        if not self.quality["afterburner"]:
+            return rects
+        player = sim.player
+        player_rect = player.rect
+        p = prev.get(player)
+        if p is not None and alpha < 1.0:
+            player_rect = player_rect.move((p[0] - player_rect.x) * (1 - alpha), (p[1] - player_rect.y) * (1 - alpha))
+        player.draw_afterburner(self.screen, player_rect, atlas, flames=sim.particles is None, view=view)
+        # chamas e escudo passam um pouco da borda do sprite
+        player_rect = player_rect.inflate(int(24 * self.scale) + 12, int(24 * self.scale) + 12)
+        rects.append(player_rect if view is None else view.rect(player_rect))
+        return rects
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="F-14 vs WWII — Sky Patrol")
+    ap.add_argument("--seed", type=int, default=None, help="semente do RNG da partida")
+    ap.add_argument("--headless", type=int, metavar="FRAMES", default=0,
+                    help="roda FRAMES ticks da simulação sem janela e sai")
+    ap.add_argument("--render", choices=("flip", "dirty"), default=RENDER_BACKEND,
+                    help="backend de desenho (dirty = só retângulos alterados, bom para software rendering)")
+    ap.add_argument("--dirty-scroll", type=int, metavar="TICKS", default=DIRTY_SCROLL_EVERY,
+                    help="com --render dirty: rola o fundo a cada TICKS ticks (0 = fundo parado)")
+    ap.add_argument("--entity-store", action="store_true", default=ENTITY_STORE,
+                    help="tiros inimigos e mísseis em arrays NumPy (bullet hell); replays guardam o modo")
+    ap.add_argument("--profile", metavar="ARQ", default=None,
+                    help="grava o tempo de cada fase por frame e exporta em ARQ (.csv/.json) ao sair")
+    ap.add_argument("--record", metavar="PASTA", default=REPLAY_DIR,
+                    help="grava um replay (.spfr) de cada partida em PASTA")
+    ap.add_argument("--replay", metavar="ARQ", default=None, help="reproduz um replay")
+    ap.add_argument("--fast", action="store_true",
+                    help="com --replay: refaz a partida sem desenhar e confere o score")
+    ap.add_argument("--pack", choices=("auto", "on", "off"), default=ASSET_PACK,
+                    help="ler os assets do assets.pak (on), dos arquivos soltos (off) ou só no EXE (auto)")
+    ap.add_argument("--canvas", type=float, metavar="ESCALA", nargs="?", const=1.0, default=None,
+                    help="desenha num canvas offscreen (BASE x ESCALA) escalado uma vez para a janela; F11 = tela cheia")
+    ap.add_argument("--filter", choices=("smooth", "fast", "integer"), default=CANVAS_FILTER,
+                    help="com --canvas: filtro da escala final")
+    ap.add_argument("--quality", type=int, choices=range(len(QUALITY_LEVELS)), default=QUALITY_LEVEL,
+                    help="fixa o nível de qualidade (0 = máximo); sem isso o governador ajusta sozinho")
+    ap.add_argument("--waves", default=WAVES,
+                    help=f"roteiro de ondas: {', '.join(WAVE_SCRIPTS)} ou um arquivo .json no mesmo formato")
+    ap.add_argument("--autosave", metavar="ARQ", default=AUTOSAVE_PATH,
+                    help="grava a partida em ARQ a cada 10 s, numa thread (recuperação depois de um crash)")
+    ap.add_argument("--resume", metavar="ARQ", default=None, help="retoma a partida de um snapshot (ex.: o do --autosave)")
+    ap.add_argument("--timings", action="store_true",
+                    help="mostra o tempo até o primeiro frame e até o jogo ficar jogável "
+                         "(e, ao sair, quantos assets foram decodificados durante a partida)")
+    args = ap.parse_args(argv)
+    globals()['STARTUP_REPORT'] = args.timings
+    globals()['ASSET_PACK'] = args.pack
+    globals()['CANVAS_FILTER'] = args.filter
+    globals()['QUALITY_LEVEL'] = args.quality
+    globals()['WAVES'] = args.waves
+    globals()['AUTOSAVE_PATH'] = args.autosave
+    if args.canvas is not None:
+        globals()['VIEW_MODE'] = "canvas"
+        globals()['CANVAS_SCALE'] = args.canvas
+    globals()['RENDER_BACKEND'] = args.render
+    globals()['ENTITY_STORE'] = args.entity_store
+    globals()['DIRTY_SCROLL_EVERY'] = args.dirty_scroll
+    globals()['PROFILE_PATH'] = args.profile
+    globals()['REPLAY_DIR'] = args.record
+    replay = Replay.load(args.replay) if args.replay else None
+    if replay is not None and args.fast:
+        prof = FrameProfiler(record=True) if args.profile else None
+        r = play_replay(replay, profiler=prof)
+        print(f"{r['frames']} ticks em {r['elapsed_s']:.2f}s ({r['fps']:.0f} fps) | "
+              f"score {r['score']} (gravado {r['expected_score']}) {'OK' if r['match'] else 'DIVERGIU'}")
+        if prof:
+            prof.export(args.profile)
+        sys.exit(0 if r["match"] else 1)
+    if args.headless:
+        prof = FrameProfiler(record=True) if args.profile else None
+        r = run_headless(args.headless, seed=args.seed or 0, profiler=prof)
+        print(f"{r['frames']} frames em {r['elapsed_s']:.2f}s ({r['fps']:.0f} fps) | "
+              f"partidas {r['games']}  melhor {r['best']}")
+        if prof:
+            prof.export(args.profile)
+        return
+    if replay is not None and args.resume:
+        ap.error("--resume não combina com --replay")
+    resume = None
+    if args.resume:
+        with open(args.resume, "rb") as f:
+            resume = f.read()
+    game = Game(seed=args.seed, replay=replay, resume=resume)
+    if replay is not None or resume is not None:
+        game.state = "game"
+    game.run()
 
 if __name__ == "__main__":
-    Game().run()
+    main()
@@ -0,0 +1,54 @@
+# Benchmark do broad-phase de colisão: pygame.sprite.groupcollide (O(N·M))
+# contra o SpatialHash do jogo, com o número de entidades crescendo até milhares.
+#   python bench/bench_collisions.py [--frames 30] [--counts 100,500,1000,2000,5000]
+import os, sys, time, random, argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import SkyPatrolFighter_game as game
+
+def setup():
+    pygame.init()
+    game.GFX_SCALE = 1.0
+    game.WIDTH, game.HEIGHT = game.BASE_W, game.BASE_H
+    pygame.display.set_mode((game.WIDTH, game.HEIGHT))
+
+def populate(n, rng):
+    # metade inimigos, metade tiros do player (proporção parecida com o jogo em diff alto)
+    enemies, bullets = pygame.sprite.Group(), pygame.sprite.Group()
+    for _ in range(n // 2):
+        e = game.Enemy(rng.choice(["drone", "ufo"]))
+        e.rect.center = (rng.randrange(game.WIDTH), rng.randrange(game.HEIGHT))
+        enemies.add(e)
+        bullets.add(game.Bullet(rng.randrange(game.WIDTH), rng.randrange(game.HEIGHT)))
+    return enemies, bullets
+
+def time_frames(fn, frames):
+    t0 = time.perf_counter()
+    hits = 0
+    for _ in range(frames):
+        hits += len(fn())
+    return (time.perf_counter() - t0) / frames * 1000.0, hits // frames
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=30)
+    ap.add_argument("--counts", default="100,500,1000,2000,5000")
+    ap.add_argument("--cell", type=int, default=game.COLLISION_CELL)
+    args = ap.parse_args(argv)
+    setup()
+    grid = game.SpatialHash(args.cell)
+    print(f"{'entidades':>9} {'groupcollide ms':>16} {'hash ms':>9} {'ganho':>7} {'hits':>6}")
+    for n in (int(c) for c in args.counts.split(",")):
+        enemies, bullets = populate(n, random.Random(n))
+        # dokill=False para que todos os frames meçam o mesmo conjunto
+        ms_pg, hits_pg = time_frames(lambda: pygame.sprite.groupcollide(enemies, bullets, False, False), args.frames)
+        ms_hs, hits_hs = time_frames(lambda: grid.build(bullets).groupcollide(enemies, False), args.frames)
+        assert hits_pg == hits_hs, (hits_pg, hits_hs)
+        print(f"{n:>9} {ms_pg:>16.3f} {ms_hs:>9.3f} {ms_pg / max(ms_hs, 1e-9):>6.1f}x {hits_hs:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Benchmark do EntityStore (NumPy) contra sprites EnemyBullet em Group.update():
+# custo por tick de mover + fazer culling de N projéteis, até dezenas de milhares.
+#   python bench/bench_entities.py [--ticks 60] [--counts 1000,10000,50000]
+import os, sys, time, random, argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import SkyPatrolFighter_game as game
+
+def setup():
+    pygame.init()
+    game.configure_view(1.0)
+    pygame.display.set_mode((game.WIDTH, game.HEIGHT))
+
+def bench_sprites(n, ticks, rng):
+    group = pygame.sprite.Group(game.EnemyBullet(rng.randrange(game.WIDTH), rng.randrange(game.HEIGHT))
+                                for _ in range(n))
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        group.update()
+        # repõe quem saiu da tela para manter N constante
+        for _ in range(n - len(group)):
+            group.add(game.EnemyBullet(rng.randrange(game.WIDTH), 0))
+    return (time.perf_counter() - t0) / ticks * 1000.0
+
+def bench_store(n, ticks, rng):
+    img = game.sprite_image("enemy_bullet.png", 1.0, game._enemy_bullet_fallback)
+    store = game.EntityStore(n, img)
+    store.spawn_many([rng.randrange(game.WIDTH) for _ in range(n)],
+                     [rng.randrange(game.HEIGHT) for _ in range(n)], 0.0, 6.0)
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        store.update(game.WIDTH, game.HEIGHT)
+        missing = n - len(store)
+        if missing:
+            store.spawn_many([rng.randrange(game.WIDTH) for _ in range(missing)], [0.0] * missing, 0.0, 6.0)
+    return (time.perf_counter() - t0) / ticks * 1000.0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ticks", type=int, default=60)
+    ap.add_argument("--counts", default="1000,10000,50000")
+    args = ap.parse_args(argv)
+    if game.np is None:
+        sys.exit("NumPy não instalado: EntityStore indisponível")
+    setup()
+    print(f"{'projéteis':>9} {'sprites ms':>11} {'store ms':>9} {'ganho':>7}")
+    for n in (int(c) for c in args.counts.split(",")):
+        ms_spr = bench_sprites(n, args.ticks, random.Random(n))
+        ms_np = bench_store(n, args.ticks, random.Random(n))
+        print(f"{n:>9} {ms_spr:>11.3f} {ms_np:>9.3f} {ms_spr / max(ms_np, 1e-9):>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# Suite de benchmark com cenários de estresse e gate de regressão.
+# Roda com os drivers SDL "dummy" (sem janela/áudio), usando as classes reais do jogo.
+#   python bench/run_bench.py                      -> roda, grava bench/results.json e compara com o baseline
+#   python bench/run_bench.py --save-baseline      -> grava o resultado atual como baseline
+#   python bench/run_bench.py --repeat 9           -> 9 rodadas intercaladas (padrão: as do baseline)
+#   python bench/run_bench.py --only boss_fight --frames 300
+import os, sys, gc, json, time, random, platform, argparse, tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import pygame
+import SkyPatrolFighter_game as game
+
+RESULTS = os.path.join(HERE, "results.json")
+BASELINE = os.path.join(HERE, "baseline.json")
+BG = (18, 24, 42)
+ATLAS = None        # atlas de sprites do jogo (None com --no-atlas)
+REPEAT = 7          # rodadas por cenário quando o baseline não diz outra coisa
+
+# ---------------- Cenários ----------------
+# setup(sim, rng) prepara o estado; tick(sim, frame, rng) devolve as entradas do tick
+# (e pode injetar carga extra). O player é imortal para o cenário não acabar no meio.
+def _immortal(sim, rng=None):
+    sim.player.lives = 10**9
+
+def setup_normal(sim, rng):
+    _immortal(sim)
+
+def setup_max_diff(sim, rng):
+    # spawn já no piso desde o início (um inimigo a cada 14 ticks)
+    script = dict(game.WAVE_SCRIPTS["classic"], endless={"interval": [14, 14], "ramp": 150, "mix": {"drone": 6, "ufo": 4}})
+    sim.waves = game.WaveScript(script, sim.scale, "max_diff")
+    sim.reset()
+    _immortal(sim)
+
+def setup_boss(sim, rng):
+    _immortal(sim)
+    sim.next_boss_score = 10**9
+    b = game.Boss(scale=sim.scale)
+    b.rect.top = int(20 * game.GFX_SCALE)
+    b.entered = True
+    b.hp = b.max_hp = 10**9     # leque de 5 tiros a cada 40 ticks, sem fim
+    sim.boss_group.add(b); sim.all.add(b)
+
+def tick_missile_salvo(sim, frame, rng):
+    # a cada 120 ticks: 20 alvos e 20 mísseis guiados de uma vez
+    if frame % 120 == 0:
+        for _ in range(20):
+            e = game.Enemy("fighter", scale=sim.scale, rng=rng)
+            e.rect.y = rng.randrange(40, game.HEIGHT // 2)
+            e.speedy = 1
+            sim.enemies.add(e); sim.all.add(e)
+        px, py = sim.player.rect.centerx, sim.player.rect.top
+        for i in range(20):
+            m = sim.pools[game.HomingMissile].acquire(px + (i - 10) * 4, py, scale=sim.scale)
+            m.target = sim.find_nearest_target(m.rect.center)
+            sim.missiles.add(m); sim.all.add(m)
+    return game.IN_FIRE
+
+def tick_explosions(sim, frame, rng):
+    # cadeia de 500 explosões (com destroços, sob o orçamento de partículas), reposta quando acaba
+    if len(sim.effects) == 0 and (sim.particles is None or len(sim.particles) <= 2):
+        for _ in range(500):
+            sim.explode((rng.randrange(game.WIDTH), rng.randrange(game.HEIGHT)))
+    return 0
+
+SCENARIOS = {
+    "normal_wave":     (setup_normal, None),
+    "max_diff":        (setup_max_diff, None),
+    "boss_fight":      (setup_boss, None),
+    "missile_salvo":   (_immortal, tick_missile_salvo),
+    "explosion_chain": (_immortal, tick_explosions),
+}
+
+# ---------------- Execução ----------------
+def render(screen, sim, prof):
+    with prof.scope("background"):
+        screen.fill(BG)
+    with prof.scope("sprites"):
+        for layer in sim.draw_layers():
+            seq = [(s.image, s.rect) for s in layer]
+            screen.blits(ATLAS.batch(seq) if ATLAS else seq, doreturn=False)
+            if layer is sim.enemy_bullets and sim.bullet_store is not None:
+                sim.bullet_store.draw(screen, atlas=ATLAS)
+            if layer is sim.missiles and sim.missile_store is not None:
+                sim.missile_store.draw(screen, atlas=ATLAS)
+        if sim.particles is not None:
+            sim.particles.draw(screen, atlas=ATLAS)
+        sim.player.draw_afterburner(screen, atlas=ATLAS, flames=sim.particles is None)
+    with prof.scope("flip"):
+        pygame.display.flip()
+
+def make_sim(name, seed):
+    setup, tick = SCENARIOS[name]
+    sim = game.Simulation(scale=1.0, seed=seed)
+    rng = random.Random(seed)
+    setup(sim, rng)
+    policy = game.autopilot(seed)
+    def inputs(frame):
+        return tick(sim, frame, rng) if tick else policy(sim, frame)
+    return sim, inputs
+
+def make_voices():
+    # mesmo pool de vozes do jogo (com o driver de áudio dummy o mixer funciona sem som)
+    return game.VoiceManager({name: game.load_sound(name + ".wav") for name in game.SFX_VOICES})
+
+def run_frames(screen, sim, inputs, frames, prof, voices=None):
+    sim.profiler = prof
+    for f in range(frames):
+        prof.frame_begin()
+        events = sim.step(inputs(f))
+        if voices is not None:
+            with prof.scope("audio"):
+                voices.play(events)
+        render(screen, sim, prof)
+        prof.frame_end(sim.entity_counts())
+
+def measure_snapshot(sim, reps=50):
+    # tamanho do snapshot no fim do cenário e tempo médio de snapshot()/restore()
+    data = sim.snapshot()
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        sim.snapshot()
+    t1 = time.perf_counter()
+    for _ in range(reps):
+        sim.restore(data)
+    t2 = time.perf_counter()
+    return {"bytes": len(data), "save_ms": (t1 - t0) * 1000.0 / reps, "restore_ms": (t2 - t1) * 1000.0 / reps}
+
+def sim_config(sim):
+    # o que muda a carga do cenário: sem NumPy não há partículas nem EntityStore
+    return {"numpy": game.np is not None, "particles": sim.particles is not None,
+            "entity_store": sim.bullet_store is not None}
+
+def run_scenario(screen, name, frames, seed=1234):
+    # 1) tempo: profiler ligado, sem tracemalloc
+    sim, inputs = make_sim(name, seed)
+    prof = game.FrameProfiler(window=frames)
+    voices = make_voices()
+    gc.collect()
+    gc0 = [s["collections"] for s in gc.get_stats()]
+    t0 = time.perf_counter()
+    run_frames(screen, sim, inputs, frames, prof, voices)
+    elapsed = time.perf_counter() - t0
+    gc1 = [s["collections"] for s in gc.get_stats()]
+    peak_counts = {}
+    for _, _, counts in prof.history:
+        for k, v in counts.items():
+            peak_counts[k] = max(peak_counts.get(k, 0), v)
+    snapshot = measure_snapshot(sim)
+
+    # 2) alocações: mesma carga com tracemalloc (mais lento, por isso separado)
+    sim, inputs = make_sim(name, seed)
+    warm = min(60, frames // 4)
+    run_frames(screen, sim, inputs, warm, game.NULL_PROFILER)
+    tracemalloc.start()
+    snap0 = tracemalloc.take_snapshot()
+    run_frames(screen, sim, inputs, frames - warm, game.NULL_PROFILER)
+    cur, peak = tracemalloc.get_traced_memory()
+    snap1 = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    grown = sum(st.size_diff for st in snap1.compare_to(snap0, "filename") if st.size_diff > 0)
+
+    return {
+        "frames": frames,
+        "fps": frames / elapsed,
+        "frame_ms": prof.percentiles("total"),
+        "phases_ms": {k: v for k, v in prof.summary().items() if k != "total"},
+        "gc_collections": [b - a for a, b in zip(gc0, gc1)],
+        "alloc_peak_kb": peak / 1024.0,
+        "alloc_growth_kb": grown / 1024.0,
+        "entities_peak": peak_counts,
+        "pools": sim.pool_stats(),
+        "snapshot": snapshot,
+        "voices": voices.stats(),
+        "config": sim_config(sim),
+    }
+
+def median_run(runs):
+    # a rodada mediana por fps, com fps e percentis do frame trocados pelas medianas
+    # de cada um: é isso que o gate compara, dos dois lados
+    runs = sorted(runs, key=lambda r: r["fps"])
+    r = dict(runs[len(runs) // 2])
+    mid = lambda vals: sorted(vals)[len(vals) // 2]
+    r["frame_ms"] = {k: mid([x["frame_ms"][k] for x in runs]) for k in r["frame_ms"]}
+    r["runs"] = len(runs)
+    return r
+
+# ---------------- Gate de regressão ----------------
+def compare(results, baseline, tolerance):
+    # regressão = fps caiu ou p95 do frame subiu além da tolerância; alocação cresceu além de 2x.
+    # Cenário gravado com outra configuração (sem NumPy, EntityStore ligado) não é comparável.
+    problems, skipped = [], []
+    for name, cur in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if base.get("config") != cur["config"]:
+            skipped.append(f"{name}: baseline {base.get('config')}, agora {cur['config']}")
+            continue
+        if cur["fps"] < base["fps"] * (1 - tolerance):
+            problems.append(f"{name}: fps {cur['fps']:.0f} < baseline {base['fps']:.0f}")
+        if cur["frame_ms"]["p95"] > base["frame_ms"]["p95"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {cur['frame_ms']['p95']:.3f}ms > baseline {base['frame_ms']['p95']:.3f}ms")
+        if cur["alloc_growth_kb"] > max(64.0, base["alloc_growth_kb"] * 2):
+            problems.append(f"{name}: memória cresceu {cur['alloc_growth_kb']:.0f}KB "
+                            f"(baseline {base['alloc_growth_kb']:.0f}KB)")
+    return problems, skipped
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="benchmark dos cenários de estresse")
+    ap.add_argument("--frames", type=int, default=600)
+    ap.add_argument("--only", action="append", choices=sorted(SCENARIOS), help="roda só este cenário (repetível)")
+    ap.add_argument("--out", default=RESULTS)
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="folga antes de acusar regressão (0.15 = 15%%)")
+    ap.add_argument("--no-atlas", action="store_true", help="desenha cada sprite da própria Surface")
+    ap.add_argument("--repeat", type=int, default=None,
+                    help=f"rodadas por cenário, comparadas pela mediana (padrão: as do baseline, ou {REPEAT})")
+    args = ap.parse_args(argv)
+    global ATLAS
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    repeat = max(1, args.repeat or (baseline or {}).get("repeat", REPEAT))
+
+    pygame.init()
+    game.configure_view(1.0)
+    screen = pygame.display.set_mode((game.WIDTH, game.HEIGHT))
+    ATLAS = None if args.no_atlas else game.build_sprite_atlas(1.0)
+
+    results = {"python": platform.python_version(), "pygame": pygame.version.ver,
+               "machine": platform.machine(), "frames": args.frames, "repeat": repeat, "scenarios": {}}
+    print(f"{'cenário':<16}{'fps':>8}{'p50 ms':>9}{'p95 ms':>9}{'gc0':>6}{'pico KB':>9}"
+          f"{'snap KB':>9}{'save ms':>9}{'load ms':>9}")
+    # máquina ruidosa (VM de 1 vCPU): uma rodada cai 20-40% fora da curva e a lentidão
+    # vem em fases de minutos; rodadas intercaladas entre cenários e fica a mediana por fps
+    names = args.only or list(SCENARIOS)
+    runs = {name: [] for name in names}
+    for _ in range(repeat):
+        for name in names:
+            runs[name].append(run_scenario(screen, name, args.frames))
+    for name in names:
+        r = median_run(runs[name])
+        results["scenarios"][name] = r
+        print(f"{name:<16}{r['fps']:>8.0f}{r['frame_ms']['p50']:>9.3f}{r['frame_ms']['p95']:>9.3f}"
+              f"{r['gc_collections'][0]:>6}{r['alloc_peak_kb']:>9.0f}"
+              f"{r['snapshot']['bytes'] / 1024:>9.1f}{r['snapshot']['save_ms']:>9.3f}{r['snapshot']['restore_ms']:>9.3f}")
+
+    target = args.baseline if args.save_baseline else args.out
+    with open(target, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+    print(f"resultados em {target}")
+    if baseline is None:
+        return 0
+    problems, skipped = compare(results, baseline, args.tolerance)
+    for p in skipped:
+        print("PULADO (outra configuração)", p)
+    for p in problems:
+        print("REGRESSÃO", p)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
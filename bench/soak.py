@@ -0,0 +1,203 @@
+# Soak: horas de partida simulada sem janela (entradas de script ou aleatórias, muitos
+# ciclos de game over -> reset), amostrando tracemalloc, objetos vivos por classe e
+# memória de Surfaces. Se algo cresce sem parar, sai com código 1 e um relatório de
+# diferenças (classes, Surfaces e as linhas que mais alocaram).
+#   python bench/soak.py                                 -> 1 hora simulada, amostra a cada minuto
+#   python bench/soak.py --hours 4 --draw                -> desenha cada frame (fundo, atlas, HUD)
+#   python bench/soak.py --inputs random --reset-every 1800 --rewind-every 600 --report soak.json
+#   python bench/soak.py --replay replays/ARQUIVO.spfr   -> repete o replay até dar as horas
+import os, sys, gc, json, time, random, argparse, tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import SkyPatrolFighter_game as game
+
+MODULES = (game.__name__, "pygame.sprite")     # classes contadas objeto a objeto
+# o que o próprio soak aloca (amostras, contagens) não entra na conta
+OWN = (tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__))
+BYTES_SLACK = 128 * 1024                       # folga absoluta para métricas em bytes
+COUNT_SLACK = 16                               # ... e para contagens de objetos
+
+# ---------------- Entradas ----------------
+def random_inputs(seed, hold=10):
+    # bits aleatórios mantidos por `hold` ticks (míssil só na borda, como o teclado)
+    rng = random.Random(seed)
+    state = {"bits": 0}
+    def policy(sim, frame):
+        if frame % hold == 0:
+            state["bits"] = rng.getrandbits(5)
+            return state["bits"] | (game.IN_MISSILE if rng.random() < 0.3 else 0)
+        return state["bits"]
+    return policy
+
+# ---------------- Amostras ----------------
+def live_objects():
+    # objetos por classe do jogo/pygame.sprite; Surfaces e Sounds não são rastreados pelo
+    # gc, então aparecem como referentes de quem os segura (dicts, listas, sprites)
+    counts = {}
+    surfaces = {}
+    sounds = set()
+    for obj in gc.get_objects():
+        t = type(obj)
+        if t.__module__ in MODULES:
+            counts[t.__name__] = counts.get(t.__name__, 0) + 1
+        for ref in gc.get_referents(obj):
+            if isinstance(ref, pygame.Surface):
+                surfaces[id(ref)] = ref
+            elif isinstance(ref, pygame.mixer.Sound):
+                sounds.add(id(ref))
+    # subsurface divide os pixels com a mãe: só conta a memória de quem é dono
+    surface_bytes = sum(s.get_width() * s.get_height() * s.get_bytesize()
+                        for s in surfaces.values() if s.get_parent() is None)
+    counts["Surface"] = len(surfaces)
+    counts["Sound"] = len(sounds)
+    return counts, surface_bytes
+
+def traced_snapshot():
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces(OWN)
+
+def take_sample(g, ticks, games):
+    traced = sum(st.size for st in traced_snapshot().statistics("filename"))
+    counts, surface_bytes = live_objects()
+    return {"ticks": ticks, "games": games, "traced": traced, "traced_peak": tracemalloc.get_traced_memory()[1],
+            "surface_bytes": surface_bytes, "cache_items": len(game.ASSET_CACHE),
+            "late_decodes": game.ASSET_CACHE.late_count, "rewind": len(g.rewind), "objects": counts}
+
+def series(samples):
+    # métrica -> valores ao longo das amostras (classes ausentes contam como 0)
+    out = {m: [s[m] for s in samples] for m in ("traced", "surface_bytes", "cache_items", "late_decodes")}
+    names = sorted({k for s in samples for k in s["objects"]})
+    for name in names:
+        out[name] = [s["objects"].get(name, 0) for s in samples]
+    return out
+
+def growing(samples, tolerance):
+    # limitado = o máximo da segunda metade não passa do máximo da primeira (com folga);
+    # vazamento ao longo de horas empurra a segunda metade para cima
+    problems = []
+    half = len(samples) // 2
+    for name, vals in series(samples).items():
+        slack = BYTES_SLACK if name in ("traced", "surface_bytes") else COUNT_SLACK
+        first, last = max(vals[:half]), max(vals[half:])
+        if last > first * (1 + tolerance) + slack:
+            problems.append((name, first, last))
+    return problems
+
+# ---------------- Execução ----------------
+def make_game(args):
+    game.WAVES = args.waves
+    game.ENTITY_STORE = args.store
+    game.REPLAY_DIR = None
+    game.AUTOSAVE_PATH = None
+    replay = game.Replay.load(args.replay) if args.replay else None
+    g = game.Game(seed=args.seed, replay=replay)
+    g.finish_loading()
+    g.state = "game"
+    return g
+
+def fmt_kb(n):
+    return f"{n / 1024:.0f}"
+
+def run(args):
+    g = make_game(args)
+    policy = game.autopilot(args.seed) if args.inputs == "autopilot" else random_inputs(args.seed)
+    total = int(args.hours * 3600 * game.TICK_RATE)
+    warmup = min(args.warmup, total // 4)
+    prof = g.profiler
+    samples = []
+    games = 1
+    frame = 0
+    t0 = time.perf_counter()
+    tracemalloc.start(args.depth)
+    snap0 = None
+    print(f"{'tempo':>8}{'ticks':>10}{'partidas':>9}{'traced KB':>11}{'surf KB':>9}{'surfaces':>9}{'sprites':>9}")
+    for t in range(1, total + 1):
+        prof.frame_begin()
+        bits = g.next_inputs(False) if g.replay is not None else policy(g.sim, frame)
+        frame += 1
+        over = bits is None or not g.tick(bits)
+        if args.draw:
+            g.draw_frame()
+        prof.frame_end(g.sim.entity_counts())
+        if over or (args.reset_every and frame >= args.reset_every):
+            g.reset()               # como o ENTER do game over
+            g.state = "game"
+            games += 1
+            frame = 0
+        elif args.rewind_every and t % args.rewind_every == 0 and g.rewind:
+            g.restore(g.rewind.pop())
+        if t == warmup:
+            snap0 = traced_snapshot()
+        if t >= warmup and (t - warmup) % args.sample_every == 0:
+            s = take_sample(g, t, games)
+            samples.append(s)
+            sprites = sum(v for k, v in s["objects"].items() if k not in ("Surface", "Sound"))
+            minutes = t / game.TICK_RATE / 60
+            print(f"{int(minutes // 60)}:{int(minutes % 60):02d}h{t:>10}{games:>9}{fmt_kb(s['traced']):>11}"
+                  f"{fmt_kb(s['surface_bytes']):>9}{s['objects']['Surface']:>9}{sprites:>9}")
+    snap1 = traced_snapshot()
+    tracemalloc.stop()
+    elapsed = time.perf_counter() - t0
+    return g, samples, snap0, snap1, elapsed, games
+
+def report(samples, snap0, snap1, problems, top):
+    # diferenças entre a primeira e a última amostra + quem mais alocou no meio tempo
+    first, last = samples[0], samples[-1]
+    print("\ncrescimento (primeira -> última amostra):")
+    for name, vals in series([first, last]).items():
+        if vals[1] != vals[0]:
+            mark = "  <-- sem limite" if any(p[0] == name for p in problems) else ""
+            print(f"  {name:<20}{vals[0]:>12} -> {vals[1]:<12}{vals[1] - vals[0]:+}{mark}")
+    if snap0 is not None:
+        print(f"\ntop {top} linhas por memória retida (tracemalloc):")
+        for st in snap1.compare_to(snap0, "lineno")[:top]:
+            print(f"  {st.size_diff / 1024:+9.1f} KB {st.count_diff:+7} blocos  {st.traceback}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="soak: horas de partida simulada atrás de vazamentos")
+    ap.add_argument("--hours", type=float, default=1.0, help="horas de jogo simulado (a 60 ticks/s)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--inputs", choices=("autopilot", "random"), default="autopilot")
+    ap.add_argument("--replay", metavar="ARQ", default=None, help="usa as entradas de um replay, repetido")
+    ap.add_argument("--waves", default=game.WAVES)
+    ap.add_argument("--store", action="store_true", help="tiros inimigos no EntityStore (NumPy)")
+    ap.add_argument("--draw", action="store_true", help="desenha cada frame (mais lento)")
+    ap.add_argument("--reset-every", type=int, default=0, metavar="TICKS",
+                    help="força um reset a cada TICKS ticks de partida (além do game over)")
+    ap.add_argument("--rewind-every", type=int, default=0, metavar="TICKS",
+                    help="rebobina (restore de snapshot) a cada TICKS ticks")
+    ap.add_argument("--sample-every", type=int, default=3600, metavar="TICKS")
+    ap.add_argument("--warmup", type=int, default=7200, metavar="TICKS",
+                    help="ticks antes da primeira amostra (caches e pools enchendo)")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="crescimento relativo aceito (0.10 = 10%%)")
+    ap.add_argument("--depth", type=int, default=1, help="quadros de traceback guardados pelo tracemalloc")
+    ap.add_argument("--top", type=int, default=15, help="linhas no relatório do tracemalloc")
+    ap.add_argument("--report", metavar="ARQ", default=None, help="grava as amostras em JSON")
+    args = ap.parse_args(argv)
+
+    g, samples, snap0, snap1, elapsed, games = run(args)
+    ticks = samples[-1]["ticks"] if samples else 0
+    print(f"\n{ticks} ticks ({ticks / game.TICK_RATE / 3600:.2f} h simuladas) em {elapsed:.0f}s, "
+          f"{games} partidas, pools {g.sim.pool_stats()}")
+    if len(samples) < 4:
+        print("amostras insuficientes para julgar crescimento (aumente --hours ou diminua --sample-every)")
+        return 0
+    problems = growing(samples, args.tolerance)
+    report(samples, snap0, snap1, problems, args.top)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"args": vars(args), "elapsed_s": elapsed, "games": games, "samples": samples,
+                       "growing": problems}, f, indent=1)
+        print(f"amostras em {args.report}")
+    for name, first, last in problems:
+        print(f"VAZAMENTO {name}: máximo {first} na primeira metade, {last} na segunda")
+    if not problems:
+        print("OK: memória e objetos estáveis")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
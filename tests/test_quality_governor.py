@@ -0,0 +1,39 @@
+# Governador de qualidade: esperas separadas para subir e descer.
+#   python -m pytest tests
+import os, sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import SkyPatrolFighter_game as game
+
+BUDGET = 1000.0 / 60
+
+def feed(gov, frame_ms, frames):
+    # devolve o índice (1-based) do frame em que o nível mudou, ou None
+    for i in range(1, frames + 1):
+        if gov.sample(frame_ms):
+            return i
+    return None
+
+def test_overload_right_after_step_up_drops_when_window_refills():
+    gov = game.QualityGovernor(BUDGET)
+    gov.set_level(1)
+    assert feed(gov, 4.0, 60) == 60 and gov.level == 0        # folga: sobe no frame 60
+    # 30 ms (2x o orçamento) a partir do 61: desce assim que a janela enche de novo,
+    # sem esperar o hold_up de 300 frames
+    assert feed(gov, 30.0, 400) == gov.samples.maxlen
+    assert gov.level == 1
+
+def test_step_up_still_waits_hold_up():
+    gov = game.QualityGovernor(BUDGET)
+    gov.set_level(2)
+    assert feed(gov, 4.0, 60) == 60 and gov.level == 1
+    assert feed(gov, 4.0, gov.hold_up - 1) is None            # segunda subida só depois do hold_up
+    assert feed(gov, 4.0, 1) == 1 and gov.level == 0
+
+def test_drop_waits_hold_down_before_dropping_again():
+    gov = game.QualityGovernor(BUDGET)
+    assert feed(gov, 30.0, 60) == 60 and gov.level == 1
+    assert feed(gov, 30.0, 60) == 60 and gov.level == 2       # janela (60) > hold_down (30)
@@ -0,0 +1,73 @@
+# Build: empacota assets/images e assets/sounds em um único assets.pak indexado.
+# Imagens vão como pixels RGBA prontos (sem decodificar PNG no start); sons vão em PCM
+# no formato do mixer (mais o arquivo original, para mixer aberto em outro formato).
+#   python tools/pack_assets.py [--out assets.pak] [--freq 44100 --size -16 --channels 2]
+# No PyInstaller:  --add-data "assets.pak;."   (o jogo usa o pack sozinho quando é EXE)
+import os, sys, argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pygame
+import SkyPatrolFighter_game as game
+
+ALIGN = 16      # dados alinhados: Surfaces/Sounds apontam direto para o mmap
+
+def collect(freq, size, channels):
+    entries = []    # (nome, tipo, a, b, c, bytes)
+    for name in sorted(os.listdir(game.IMG_DIR)):
+        if name.lower().endswith(".png"):
+            img = pygame.image.load(os.path.join(game.IMG_DIR, name))
+            img = img.convert_alpha() if pygame.display.get_surface() else img
+            w, h = img.get_size()
+            entries.append(("images/" + name, game.PACK_RGBA, w, h, 0, pygame.image.tobytes(img, "RGBA")))
+    pygame.mixer.init(freq, size, channels)
+    fmt = pygame.mixer.get_init()
+    for name in sorted(os.listdir(game.SND_DIR)):
+        if not name.lower().endswith((".wav", ".ogg")) or name.startswith("bgm_"):
+            continue    # BGM continua solta: pygame.mixer.music faz streaming do arquivo
+        path = os.path.join(game.SND_DIR, name)
+        with open(path, "rb") as f:
+            entries.append(("sounds/" + name, game.PACK_FILE, 0, 0, 0, f.read()))
+        try:
+            pcm = pygame.mixer.Sound(path).get_raw()
+        except pygame.error as e:
+            print(f"aviso: {name}: {e}")
+            continue
+        entries.append(("sounds/" + name, game.PACK_PCM, fmt[0], fmt[1], fmt[2], pcm))
+    return entries
+
+def write_pack(path, entries):
+    index = []
+    with open(path, "wb") as f:
+        f.write(game.PACK_HEADER.pack(game.PACK_MAGIC, game.PACK_VERSION, 0, 0))
+        for name, kind, a, b, c, data in entries:
+            f.write(b"\0" * (-f.tell() % ALIGN))
+            index.append((name, kind, a, b, c, f.tell(), len(data)))
+            f.write(data)
+        index_at = f.tell()
+        for name, kind, a, b, c, off, size in index:
+            raw = name.encode("utf-8")
+            f.write(game.PACK_ENTRY.pack(len(raw), kind, a, b, c, off, size))
+            f.write(raw)
+        f.seek(0)
+        f.write(game.PACK_HEADER.pack(game.PACK_MAGIC, game.PACK_VERSION, len(index), index_at))
+    return index
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="gera o assets.pak")
+    ap.add_argument("--out", default=os.path.join(ROOT, "assets.pak"))
+    ap.add_argument("--freq", type=int, default=44100)
+    ap.add_argument("--size", type=int, default=-16)
+    ap.add_argument("--channels", type=int, default=2)
+    args = ap.parse_args(argv)
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    index = write_pack(args.out, collect(args.freq, args.size, args.channels))
+    total = os.path.getsize(args.out)
+    print(f"{args.out}: {len(index)} entradas, {total / 1024:.0f} KB")
+
+if __name__ == "__main__":
+    main()